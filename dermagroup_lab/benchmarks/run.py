@@ -0,0 +1,189 @@
+# Copyright (c) 2026, DeepZide and contributors
+# For license information, please see license.txt
+
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+
+import frappe
+from frappe.utils import add_days, now, nowdate
+
+from dermagroup_lab.benchmarks.seed import seed_benchmark_data
+
+SAMPLE_SIZE = 200
+
+
+def run_benchmarks(seed_params=None, sample_size=SAMPLE_SIZE, output=None):
+	"""
+	Seed synthetic data and time the purchasing flows against it. Each flow runs on its own
+	savepoint and is rolled back, so every flow sees the same seeded state.
+	Returns: dict with run metadata and one result per flow, also written as JSON to output
+	"""
+	seed_params = seed_params or {}
+
+	start = time.perf_counter()
+	seeded = seed_benchmark_data(**seed_params)
+	seed_time = time.perf_counter() - start
+
+	rng = random.Random(seed_params.get("seed", 42))
+	pairs = [
+		(rng.choice(seeded["items"]), rng.choice(seeded["warehouses"]))
+		for _i in range(min(sample_size, len(seeded["items"])))
+	]
+
+	results = {
+		"rebuild_last_purchase_index": time_flow(rebuild_index, rollback=False),
+		"check_duplicate_requests": time_flow(check_duplicates_per_item, pairs),
+		"check_duplicate_requests_bulk": time_flow(check_duplicates_bulk, pairs),
+		"get_last_purchase_details": time_flow(last_purchase_per_pair, pairs),
+		"get_last_purchase_details_bulk": time_flow(last_purchase_bulk, pairs),
+		"work_order_stock_check": time_flow(work_order_stock_check, seeded),
+		"material_request_insert_submit": time_flow(insert_and_submit_material_requests, seeded, pairs),
+		"create_stock_minimum_purchase_requests": time_flow(create_stock_minimum_purchase_requests),
+	}
+
+	report = {
+		"timestamp": now(),
+		"commit": get_commit(),
+		"python": platform.python_version(),
+		"database": frappe.db.sql("SELECT VERSION()")[0][0],
+		"seed_params": seed_params,
+		"sample_size": len(pairs),
+		"seed_time": round(seed_time, 6),
+		"results": results,
+	}
+
+	if output:
+		with open(output, "w") as output_file:
+			json.dump(report, output_file, indent=1, default=str)
+
+	return report
+
+
+def time_flow(fn, *args, rollback=True):
+	"""
+	Time one flow, counting the SQL statements it issues. With rollback, its writes and the
+	after commit callbacks it registered are discarded.
+	Returns: dict with wall_time, sql_count, calls and per_call, or error if the flow raised
+	"""
+	sql_count = 0
+	original_sql = frappe.db.sql
+
+	def counting_sql(*sql_args, **sql_kwargs):
+		nonlocal sql_count
+		sql_count += 1
+		return original_sql(*sql_args, **sql_kwargs)
+
+	frappe.db.savepoint("benchmark_flow")
+	frappe.db.sql = counting_sql
+	start = time.perf_counter()
+	try:
+		calls = fn(*args) or 1
+		error = None
+	except Exception as e:
+		calls, error = 0, repr(e)
+	finally:
+		wall_time = time.perf_counter() - start
+		del frappe.db.sql
+		if rollback:
+			frappe.db.rollback(save_point="benchmark_flow")
+			# A savepoint rollback keeps the callbacks the flow registered, such as the jobs
+			# enqueued after commit by the Work Order stock check
+			frappe.db.after_commit.reset()
+		frappe.clear_messages()
+
+	result = {"wall_time": round(wall_time, 6), "sql_count": sql_count, "calls": calls}
+	if calls:
+		result["per_call"] = round(wall_time / calls, 6)
+	if error:
+		result["error"] = error
+	return result
+
+
+def rebuild_index():
+	from dermagroup_lab.purchasing.last_purchase import rebuild_last_purchase_index
+
+	rebuild_last_purchase_index()
+
+
+def check_duplicates_per_item(pairs):
+	from dermagroup_lab.purchasing.validations import check_duplicate_requests
+
+	for item_code, _warehouse in pairs:
+		check_duplicate_requests(item_code)
+	return len(pairs)
+
+
+def check_duplicates_bulk(pairs):
+	from dermagroup_lab.purchasing.validations import check_duplicate_requests_bulk
+
+	check_duplicate_requests_bulk([item_code for item_code, _warehouse in pairs])
+
+
+def last_purchase_per_pair(pairs):
+	from dermagroup_lab.purchasing.utils import get_last_purchase_details
+
+	for item_code, warehouse in pairs:
+		get_last_purchase_details(item_code, warehouse)
+	return len(pairs)
+
+
+def last_purchase_bulk(pairs):
+	from dermagroup_lab.purchasing.utils import get_last_purchase_details_bulk
+
+	get_last_purchase_details_bulk([{"item_code": item, "warehouse": warehouse} for item, warehouse in pairs])
+
+
+def work_order_stock_check(seeded):
+	"""
+	Run the Work Order stock check hook on an unsaved Work Order for every seeded BOM
+	"""
+	from dermagroup_lab.purchasing.utils import validate_stock_before_production
+
+	for bom_no in seeded["boms"]:
+		work_order = frappe.new_doc("Work Order")
+		work_order.company = seeded["company"]
+		work_order.bom_no = bom_no
+		work_order.production_item = frappe.db.get_value("BOM", bom_no, "item")
+		work_order.qty = 100
+		work_order.source_warehouse = seeded["warehouses"][0]
+		validate_stock_before_production(work_order, "before_submit")
+	return len(seeded["boms"])
+
+
+def insert_and_submit_material_requests(seeded, pairs):
+	for item_code, warehouse in pairs:
+		mr = frappe.new_doc("Material Request")
+		mr.material_request_type = "Purchase"
+		mr.company = seeded["company"]
+		mr.transaction_date = nowdate()
+		mr.schedule_date = add_days(nowdate(), 7)
+		mr.status = "Approved"
+		mr.append(
+			"items",
+			{"item_code": item_code, "qty": 10, "warehouse": warehouse, "schedule_date": mr.schedule_date},
+		)
+		mr.flags.skip_duplicate_check = True
+		mr.insert(ignore_permissions=True)
+		mr.submit()
+	return len(pairs)
+
+
+def create_stock_minimum_purchase_requests():
+	from dermagroup_lab.purchasing.reorder import run_reorder
+
+	# The flow runs on a savepoint, so the per-chunk commits of the scheduled run are skipped
+	return len(run_reorder(commit=False) or []) or 1
+
+
+def get_commit():
+	app_path = frappe.get_app_path("dermagroup_lab")
+	try:
+		return subprocess.check_output(
+			["git", "rev-parse", "HEAD"], cwd=os.path.dirname(app_path), text=True
+		).strip()
+	except Exception:
+		return None
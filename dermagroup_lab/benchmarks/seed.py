@@ -0,0 +1,360 @@
+# Copyright (c) 2026, DeepZide and contributors
+# For license information, please see license.txt
+
+import json
+import random
+
+import frappe
+from frappe.utils import add_days, now, nowdate
+
+from dermagroup_lab.purchasing.reorder_queue import DIRTY_PAIRS_KEY, PROCESSING_PAIRS_KEY
+
+BENCHMARK_PREFIX = "_Bench"
+INSERT_CHUNK_SIZE = 10_000
+
+
+def seed_benchmark_data(
+	items=1000,
+	warehouses=5,
+	boms=100,
+	bom_components=10,
+	purchase_receipts=2000,
+	material_requests=2000,
+	company=None,
+	seed=42,
+):
+	"""
+	Seed synthetic purchasing data with raw bulk inserts, so large volumes (e.g. 50k items x
+	5 warehouses) load in minutes. Every record is named with BENCHMARK_PREFIX so it can be
+	removed with delete_benchmark_data.
+	Returns: dict with the seeded names used by the benchmarks
+	"""
+	rng = random.Random(seed)
+	company = company or get_benchmark_company()
+	abbr, currency = frappe.get_cached_value("Company", company, ["abbr", "default_currency"])
+
+	warehouse_names = [
+		make_warehouse(f"{BENCHMARK_PREFIX} Warehouse {i}", company, abbr) for i in range(warehouses)
+	]
+	supplier_names = [make_supplier(f"{BENCHMARK_PREFIX} Supplier {i}") for i in range(10)]
+	item_codes = [f"{BENCHMARK_PREFIX}-ITEM-{i:06d}" for i in range(items)]
+
+	seed_items(item_codes, rng)
+	seed_reorder_levels_and_bins(item_codes, warehouse_names, rng)
+	bom_names = seed_boms(item_codes, warehouse_names, boms, bom_components, company, currency, rng)
+	seed_purchase_receipts(
+		item_codes, warehouse_names, supplier_names, purchase_receipts, company, currency, rng
+	)
+	seed_material_requests(item_codes, warehouse_names, material_requests, company, rng)
+	frappe.db.commit()
+
+	return {
+		"company": company,
+		"items": item_codes,
+		"warehouses": warehouse_names,
+		"suppliers": supplier_names,
+		"boms": bom_names,
+	}
+
+
+def get_benchmark_company():
+	company = frappe.defaults.get_global_default("company") or frappe.db.get_value("Company", {}, "name")
+	if not company:
+		frappe.throw("A Company is required to seed benchmark data")
+	return company
+
+
+def make_warehouse(warehouse_name, company, abbr):
+	name = f"{warehouse_name} - {abbr}"
+	if not frappe.db.exists("Warehouse", name):
+		frappe.get_doc({"doctype": "Warehouse", "warehouse_name": warehouse_name, "company": company}).insert(
+			ignore_permissions=True
+		)
+	return name
+
+
+def make_supplier(supplier_name):
+	if not frappe.db.exists("Supplier", supplier_name):
+		supplier = frappe.get_doc(
+			{
+				"doctype": "Supplier",
+				"supplier_name": supplier_name,
+				"supplier_group": frappe.db.get_value("Supplier Group", {"is_group": 0}, "name"),
+				"email_id": f"{frappe.scrub(supplier_name)}@example.com",
+			}
+		)
+		supplier.flags.ignore_mandatory = True
+		supplier.insert(ignore_permissions=True)
+	return supplier_name
+
+
+def seed_items(item_codes, rng):
+	item_group = frappe.db.get_value("Item Group", {"is_group": 0}, "name")
+	bulk_insert_rows(
+		"Item",
+		[
+			{
+				"name": item_code,
+				"item_code": item_code,
+				"item_name": item_code,
+				"item_group": item_group,
+				"stock_uom": "Nos",
+				"is_stock_item": 1,
+				"lead_time_days": rng.choice((0, 3, 7, 14)),
+			}
+			for item_code in item_codes
+		],
+	)
+
+
+def seed_reorder_levels_and_bins(item_codes, warehouses, rng):
+	"""
+	One reorder level and one Bin per item and warehouse, roughly a tenth of them below the level
+	"""
+	reorder_rows, bin_rows = [], []
+	for item_code in item_codes:
+		for idx, warehouse in enumerate(warehouses, start=1):
+			reorder_level = rng.randint(10, 100)
+			projected_qty = rng.randint(0, reorder_level) if rng.random() < 0.1 else reorder_level * 2
+			reorder_rows.append(
+				{
+					"name": frappe.generate_hash(length=12),
+					"parent": item_code,
+					"parenttype": "Item",
+					"parentfield": "reorder_levels",
+					"idx": idx,
+					"warehouse": warehouse,
+					"warehouse_reorder_level": reorder_level,
+					"warehouse_reorder_qty": reorder_level,
+					"material_request_type": "Purchase",
+				}
+			)
+			bin_rows.append(
+				{
+					"name": frappe.generate_hash(length=12),
+					"item_code": item_code,
+					"warehouse": warehouse,
+					"actual_qty": projected_qty,
+					"projected_qty": projected_qty,
+					"stock_uom": "Nos",
+				}
+			)
+
+	bulk_insert_rows("Item Reorder", reorder_rows)
+	bulk_insert_rows("Bin", bin_rows)
+
+
+def seed_boms(item_codes, warehouses, boms, bom_components, company, currency, rng):
+	"""
+	Submitted default BOMs for the first items, each consuming random raw items. Every
+	fifth BOM uses the previous BOM as a sub-assembly so the explosion has several levels.
+	"""
+	raw_items = item_codes[boms:] or item_codes
+	bom_rows, bom_item_rows, bom_names = [], [], []
+	for i, item_code in enumerate(item_codes[:boms]):
+		bom_name = f"BOM-{item_code}-001"
+		bom_rows.append(
+			{
+				"name": bom_name,
+				"item": item_code,
+				"company": company,
+				"currency": currency,
+				"quantity": 1,
+				"uom": "Nos",
+				"is_active": 1,
+				"is_default": 1,
+				"docstatus": 1,
+			}
+		)
+
+		components = rng.sample(raw_items, min(bom_components, len(raw_items)))
+		for idx, component in enumerate(components, start=1):
+			bom_item_rows.append(
+				make_bom_item(bom_name, idx, component, rng.choice(warehouses), rng.randint(1, 5))
+			)
+		if i % 5 == 4:
+			bom_item_rows.append(
+				make_bom_item(
+					bom_name, len(components) + 1, item_codes[i - 1], rng.choice(warehouses), 1, bom_names[-1]
+				)
+			)
+		bom_names.append(bom_name)
+
+	bulk_insert_rows("BOM", bom_rows)
+	bulk_insert_rows("BOM Item", bom_item_rows)
+	return bom_names
+
+
+def make_bom_item(bom_name, idx, item_code, warehouse, qty, bom_no=None):
+	return {
+		"name": frappe.generate_hash(length=12),
+		"parent": bom_name,
+		"parenttype": "BOM",
+		"parentfield": "items",
+		"idx": idx,
+		"item_code": item_code,
+		"bom_no": bom_no,
+		"qty": qty,
+		"stock_qty": qty,
+		"uom": "Nos",
+		"stock_uom": "Nos",
+		"conversion_factor": 1,
+		"source_warehouse": warehouse,
+		"docstatus": 1,
+	}
+
+
+def seed_purchase_receipts(item_codes, warehouses, suppliers, count, company, currency, rng):
+	"""
+	Submitted Purchase Receipts over the last year with five items each
+	"""
+	receipt_rows, receipt_item_rows = [], []
+	for i in range(count):
+		receipt_name = f"{BENCHMARK_PREFIX}-PR-{i:07d}"
+		warehouse = rng.choice(warehouses)
+		receipt_rows.append(
+			{
+				"name": receipt_name,
+				"supplier": rng.choice(suppliers),
+				"company": company,
+				"currency": currency,
+				"posting_date": add_days(nowdate(), -rng.randint(0, 365)),
+				"set_warehouse": warehouse,
+				"docstatus": 1,
+			}
+		)
+		for idx, item_code in enumerate(rng.sample(item_codes, min(5, len(item_codes))), start=1):
+			qty = rng.randint(1, 500)
+			receipt_item_rows.append(
+				{
+					"name": frappe.generate_hash(length=12),
+					"parent": receipt_name,
+					"parenttype": "Purchase Receipt",
+					"parentfield": "items",
+					"idx": idx,
+					"item_code": item_code,
+					"item_name": item_code,
+					"warehouse": warehouse,
+					"qty": qty,
+					"received_qty": qty,
+					"rate": rng.randint(1, 100),
+					"uom": "Nos",
+					"stock_uom": "Nos",
+					"conversion_factor": 1,
+					"docstatus": 1,
+				}
+			)
+
+	bulk_insert_rows("Purchase Receipt", receipt_rows)
+	bulk_insert_rows("Purchase Receipt Item", receipt_item_rows)
+
+
+def seed_material_requests(item_codes, warehouses, count, company, rng):
+	"""
+	Submitted Purchase Material Requests over the last 30 days with three items each
+	"""
+	request_rows, request_item_rows = [], []
+	for i in range(count):
+		request_name = f"{BENCHMARK_PREFIX}-MR-{i:07d}"
+		transaction_date = add_days(nowdate(), -rng.randint(0, 30))
+		request_rows.append(
+			{
+				"name": request_name,
+				"material_request_type": "Purchase",
+				"company": company,
+				"transaction_date": transaction_date,
+				"schedule_date": add_days(transaction_date, 7),
+				"status": "Approved",
+				"docstatus": 1,
+			}
+		)
+		for idx, item_code in enumerate(rng.sample(item_codes, min(3, len(item_codes))), start=1):
+			request_item_rows.append(
+				{
+					"name": frappe.generate_hash(length=12),
+					"parent": request_name,
+					"parenttype": "Material Request",
+					"parentfield": "items",
+					"idx": idx,
+					"item_code": item_code,
+					"item_name": item_code,
+					"warehouse": rng.choice(warehouses),
+					"qty": rng.randint(1, 100),
+					"stock_qty": 0,
+					"uom": "Nos",
+					"stock_uom": "Nos",
+					"conversion_factor": 1,
+					"schedule_date": add_days(transaction_date, 7),
+					"docstatus": 1,
+				}
+			)
+
+	bulk_insert_rows("Material Request", request_rows)
+	bulk_insert_rows("Material Request Item", request_item_rows)
+
+
+def bulk_insert_rows(doctype, rows):
+	"""
+	Raw insert of row dicts sharing the same keys, filling the standard fields
+	"""
+	if not rows:
+		return
+
+	timestamp = now()
+	user = frappe.session.user
+	for row in rows:
+		row.setdefault("creation", timestamp)
+		row.setdefault("modified", timestamp)
+		row.setdefault("owner", user)
+		row.setdefault("modified_by", user)
+
+	fields = list(rows[0])
+	frappe.db.bulk_insert(
+		doctype,
+		fields,
+		[tuple(row[field] for field in fields) for row in rows],
+		chunk_size=INSERT_CHUNK_SIZE,
+	)
+
+
+def delete_benchmark_data():
+	"""
+	Remove every record created by seed_benchmark_data and by the benchmark runs on it
+	"""
+	# "_" is a LIKE wildcard, escaped so only the prefixed records match
+	pattern = BENCHMARK_PREFIX.replace("_", "\\_") + "%"
+	benchmark_requests = frappe.db.sql_list(
+		"""
+		SELECT DISTINCT parent FROM `tabMaterial Request Item` WHERE item_code LIKE %(pattern)s
+		""",
+		{"pattern": pattern},
+	)
+	for start in range(0, len(benchmark_requests), INSERT_CHUNK_SIZE):
+		chunk = benchmark_requests[start : start + INSERT_CHUNK_SIZE]
+		frappe.db.delete("Material Request Item", {"parent": ("in", chunk)})
+		frappe.db.delete("Material Request", {"name": ("in", chunk)})
+
+	frappe.db.delete("Purchase Receipt Item", {"parent": ("like", pattern)})
+	frappe.db.delete("Purchase Receipt", {"name": ("like", pattern)})
+	frappe.db.delete("BOM Item", {"parent": ("like", f"BOM-{pattern}")})
+	frappe.db.delete("BOM", {"name": ("like", f"BOM-{pattern}")})
+	frappe.db.delete("Bin", {"item_code": ("like", pattern)})
+	frappe.db.delete("Item Reorder", {"parent": ("like", pattern)})
+	frappe.db.delete("Item Last Purchase", {"item_code": ("like", pattern)})
+	frappe.db.delete("Material Request Reservation", {"item_code": ("like", pattern)})
+	frappe.db.delete("Work Order Demand", {"item_code": ("like", pattern)})
+	frappe.db.delete("Item Demand", {"item_code": ("like", pattern)})
+	frappe.db.delete("Supplier Lead Time", {"item_code": ("like", pattern)})
+	frappe.db.delete("Item", {"name": ("like", pattern)})
+	frappe.db.delete("Supplier", {"name": ("like", pattern)})
+	frappe.db.delete("Warehouse", {"name": ("like", pattern)})
+	frappe.db.commit()
+
+	# Pairs queued for the incremental reorder by the stock changes of the benchmark runs
+	cache = frappe.cache()
+	for key in (DIRTY_PAIRS_KEY, PROCESSING_PAIRS_KEY):
+		members = [
+			member for member in cache.smembers(key) if json.loads(member)[0].startswith(BENCHMARK_PREFIX)
+		]
+		if members:
+			cache.srem(key, *members)
@@ -0,0 +1,106 @@
+# Copyright (c) 2026, DeepZide and contributors
+# For license information, please see license.txt
+
+import click
+from frappe.commands import get_site, pass_context
+
+
+@click.command("rebuild-last-purchase-index")
+@click.option("--chunk-size", default=5000, type=int, help="Purchase rows read per query")
+@pass_context
+def rebuild_last_purchase_index(context, chunk_size):
+	"""Rebuild the Item Last Purchase index from Purchase Receipt/Order history"""
+	import frappe
+
+	from dermagroup_lab.purchasing.last_purchase import rebuild_last_purchase_index as rebuild
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		rebuild(chunk_size=chunk_size)
+		print("Item Last Purchase index rebuilt successfully")
+	finally:
+		frappe.destroy()
+
+
+@click.command("hook-report")
+@click.option("--limit", default=20, type=int, help="Hooks listed per ranking")
+@pass_context
+def hook_report(context, limit):
+	"""Rank the slowest hooks and the worst N+1 offenders from the hook instrumentation log"""
+	import frappe
+
+	from dermagroup_lab.instrumentation import read_hook_records, summarize_hook_records
+
+	site = get_site(context)
+	frappe.init(site=site)
+	try:
+		report = summarize_hook_records(read_hook_records(), limit=limit)
+	finally:
+		frappe.destroy()
+
+	print("Slowest hooks (total wall time)")
+	for summary in report["slowest"]:
+		print(
+			f"  {summary['hook']}: {summary['calls']} calls, {summary['total_time']:.3f}s total, "
+			f"{summary['avg_time'] * 1000:.1f}ms avg, {summary['max_time'] * 1000:.1f}ms max, "
+			f"{summary['avg_sql_count']:.1f} queries avg, {summary['sql_time']:.3f}s in SQL"
+		)
+
+	print("N+1 offenders (most repeated statement in one call)")
+	for summary in report["n_plus_one"]:
+		print(f"  {summary['hook']}: {summary['max_repeated']}x {summary['repeated_query']}")
+
+
+@click.command("run-purchasing-benchmarks")
+@click.option("--items", default=1000, type=int, help="Items to seed")
+@click.option("--warehouses", default=5, type=int, help="Warehouses to seed, with a reorder level per item")
+@click.option("--boms", default=100, type=int, help="BOMs to seed")
+@click.option("--purchase-receipts", default=2000, type=int, help="Purchase Receipts to seed")
+@click.option("--material-requests", default=2000, type=int, help="Historical Material Requests to seed")
+@click.option("--sample-size", default=200, type=int, help="Item/warehouse pairs used by the lookups")
+@click.option("--output", default="purchasing-benchmarks.json", help="JSON file the results are written to")
+@click.option("--keep-data", is_flag=True, default=False, help="Keep the seeded data after the run")
+@pass_context
+def run_purchasing_benchmarks(
+	context, items, warehouses, boms, purchase_receipts, material_requests, sample_size, output, keep_data
+):
+	"""Seed synthetic purchasing data and time the purchasing flows, for sites with allow_tests only"""
+	import json
+
+	import frappe
+
+	from dermagroup_lab.benchmarks.run import run_benchmarks
+	from dermagroup_lab.benchmarks.seed import delete_benchmark_data
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+	if not frappe.conf.allow_tests:
+		click.secho("Benchmarks write to the database, enable allow_tests on a test site first", fg="red")
+		frappe.destroy()
+		return
+
+	try:
+		frappe.set_user("Administrator")
+		report = run_benchmarks(
+			seed_params={
+				"items": items,
+				"warehouses": warehouses,
+				"boms": boms,
+				"purchase_receipts": purchase_receipts,
+				"material_requests": material_requests,
+			},
+			sample_size=sample_size,
+			output=output,
+		)
+		print(json.dumps(report["results"], indent=1))
+		print(f"Results written to {output}")
+	finally:
+		if not keep_data:
+			delete_benchmark_data()
+		frappe.destroy()
+
+
+commands = [rebuild_last_purchase_index, hook_report, run_purchasing_benchmarks]
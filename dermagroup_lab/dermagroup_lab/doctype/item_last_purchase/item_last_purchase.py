@@ -0,0 +1,16 @@
+# Copyright (c) 2026, DeepZide and contributors
+# For license information, please see license.txt
+
+from frappe.model.document import Document
+
+from dermagroup_lab.purchasing.last_purchase import get_index_key
+
+
+class ItemLastPurchase(Document):
+	"""
+	Materialized last purchase per (item, warehouse) and source doctype, maintained by
+	dermagroup_lab.purchasing.last_purchase
+	"""
+
+	def autoname(self):
+		self.name = get_index_key(self.source_doctype, self.item_code, self.warehouse)
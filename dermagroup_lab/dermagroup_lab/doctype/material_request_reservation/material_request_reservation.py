@@ -0,0 +1,16 @@
+# Copyright (c) 2026, DeepZide and contributors
+# For license information, please see license.txt
+
+from frappe.model.document import Document
+
+from dermagroup_lab.purchasing.reservations import get_reservation_key
+
+
+class MaterialRequestReservation(Document):
+	"""
+	Claim of an item and warehouse by a Material Request on a date for its suggested supplier, maintained by
+	dermagroup_lab.purchasing.reservations
+	"""
+
+	def autoname(self):
+		self.name = get_reservation_key(self.item_code, self.warehouse, self.reservation_date, self.supplier)
@@ -0,0 +1,15 @@
+# Copyright (c) 2026, DeepZide and contributors
+# For license information, please see license.txt
+
+from frappe.model.document import Document
+
+from dermagroup_lab.purchasing.notifications import get_dispatch_key
+
+
+class SupplierDispatchLog(Document):
+	"""
+	One supplier email dispatch per Material Request and status, written by the background job
+	"""
+
+	def autoname(self):
+		self.name = get_dispatch_key(self.material_request, self.status)
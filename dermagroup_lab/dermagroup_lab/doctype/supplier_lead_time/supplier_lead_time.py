@@ -0,0 +1,16 @@
+# Copyright (c) 2026, DeepZide and contributors
+# For license information, please see license.txt
+
+from frappe.model.document import Document
+
+from dermagroup_lab.purchasing.lead_times import get_lead_time_key
+
+
+class SupplierLeadTime(Document):
+	"""
+	Days from Purchase Order to Purchase Receipt of an item from a supplier per Material Request
+	purchase type, maintained by dermagroup_lab.purchasing.lead_times
+	"""
+
+	def autoname(self):
+		self.name = get_lead_time_key(self.supplier, self.item_code, self.purchase_type)
@@ -0,0 +1,16 @@
+# Copyright (c) 2026, DeepZide and contributors
+# For license information, please see license.txt
+
+from frappe.model.document import Document
+
+from dermagroup_lab.purchasing.demand import get_demand_key
+
+
+class WorkOrderDemand(Document):
+	"""
+	Open requirement of a submitted Work Order per (item, warehouse), maintained by
+	dermagroup_lab.purchasing.demand
+	"""
+
+	def autoname(self):
+		self.name = get_demand_key(self.work_order, self.item_code, self.warehouse)
@@ -61,7 +61,10 @@ override_doctype_class = {
 }
 
 # include js in doctype views
-doctype_js = {"Material Request": "public/js/material_request.js"}
+doctype_js = {
+	"Material Request": "public/js/material_request.js",
+	"Work Order": "public/js/work_order.js",
+}
 doctype_list_js = {"Material Request": "public/js/material_request_list.js"}
 # doctype_tree_js = {"doctype" : "public/js/doctype_tree.js"}
 # doctype_calendar_js = {"doctype" : "public/js/doctype_calendar.js"}
@@ -151,17 +154,70 @@ after_install = "dermagroup_lab.install.after_install"
 # Hook on document methods and events
 
 doc_events = {
-	"Work Order": {"before_submit": "dermagroup_lab.purchasing.utils.validate_stock_before_production"},
+	"Work Order": {
+		"before_submit": "dermagroup_lab.purchasing.utils.validate_stock_before_production",
+		"on_submit": "dermagroup_lab.purchasing.demand.record_work_order_demand",
+		"on_cancel": "dermagroup_lab.purchasing.demand.release_work_order_demand",
+		"on_change": "dermagroup_lab.purchasing.demand.release_work_order_demand",
+	},
+	"Stock Entry": {
+		"on_submit": "dermagroup_lab.purchasing.demand.update_demand_from_stock_entry",
+		"on_cancel": "dermagroup_lab.purchasing.demand.update_demand_from_stock_entry",
+	},
 	"Material Request": {
 		"on_update": "dermagroup_lab.purchasing.on_update.on_update_material_request",
+		"on_update_after_submit": "dermagroup_lab.purchasing.on_update.on_update_material_request",
 		"before_insert": "dermagroup_lab.purchasing.before_insert.before_insert_material_request",
+		"after_insert": "dermagroup_lab.purchasing.reservations.link_reservations",
+		"on_cancel": "dermagroup_lab.purchasing.reservations.release_reservations",
+		"on_trash": "dermagroup_lab.purchasing.reservations.release_reservations",
+	},
+	"User": {
+		"on_update": "dermagroup_lab.purchasing.notifications.clear_role_recipients_cache",
+		"on_trash": "dermagroup_lab.purchasing.notifications.clear_role_recipients_cache",
+	},
+	"BOM": {
+		"on_update": "dermagroup_lab.purchasing.bom.clear_bom_explosion_cache",
+		"on_update_after_submit": "dermagroup_lab.purchasing.bom.clear_bom_explosion_cache",
+		"on_cancel": "dermagroup_lab.purchasing.bom.clear_bom_explosion_cache",
+		"on_trash": "dermagroup_lab.purchasing.bom.clear_bom_explosion_cache",
+	},
+	"Purchase Receipt": {
+		"on_submit": "dermagroup_lab.purchasing.last_purchase.update_last_purchase_index",
+		"on_cancel": "dermagroup_lab.purchasing.last_purchase.revert_last_purchase_index",
+	},
+	"Purchase Order": {
+		"on_submit": "dermagroup_lab.purchasing.last_purchase.update_last_purchase_index",
+		"on_cancel": "dermagroup_lab.purchasing.last_purchase.revert_last_purchase_index",
+	},
+	"Warehouse": {"on_update": "dermagroup_lab.purchasing.memo.clear_memo_for_doc"},
+	"Company": {"on_update": "dermagroup_lab.purchasing.memo.clear_memo_for_doc"},
+	"Item": {"on_update": "dermagroup_lab.purchasing.memo.clear_memo_for_doc"},
+	"Supplier": {"on_update": "dermagroup_lab.purchasing.memo.clear_memo_for_doc"},
+	"Property Setter": {"on_update": "dermagroup_lab.purchasing.memo.clear_memo_for_doc"},
+	"Stock Ledger Entry": {"on_submit": "dermagroup_lab.purchasing.reorder_queue.mark_stock_change"},
+	"Bin": {
+		"on_update": "dermagroup_lab.purchasing.reorder_queue.mark_stock_change",
+		"on_change": "dermagroup_lab.purchasing.reorder_queue.mark_stock_change",
 	},
 }
 
+# Material Request Status Hooks
+# -----------------------------
+# Keyed by "<to status>" or "<from status> -> <to status>", called with the list of moved documents
+material_request_status_hooks = {
+	"Pending Approval": ["dermagroup_lab.purchasing.on_update.notify_pending_approval"],
+	"Sent to Supplier": ["dermagroup_lab.purchasing.on_update.dispatch_to_supplier"],
+}
+
 # Scheduled Tasks
 # ---------------
 
-scheduler_events = {"daily": ["dermagroup_lab.tasks.daily"]}
+scheduler_events = {
+	"daily": ["dermagroup_lab.tasks.daily"],
+	"weekly": ["dermagroup_lab.tasks.weekly"],
+	"cron": {"*/15 * * * *": ["dermagroup_lab.tasks.incremental_reorder"]},
+}
 
 # Testing
 # -------
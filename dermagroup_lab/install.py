@@ -4,7 +4,10 @@
 import frappe
 from frappe.permissions import add_permission, update_permission_property
 
+from dermagroup_lab.instrumentation import instrument_hook
 
+
+@instrument_hook
 def after_install():
 	"""
 	Configure custom permissions after app installation
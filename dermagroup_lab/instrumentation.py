@@ -0,0 +1,201 @@
+# Copyright (c) 2026, DeepZide and contributors
+# For license information, please see license.txt
+
+import functools
+import glob
+import json
+import time
+
+import frappe
+from frappe.model.document import Document
+
+INSTRUMENTATION_FLAG = "dermagroup_lab_instrument_hooks"
+HOOK_LOG = "dermagroup_lab.hooks"
+HOOK_LOG_MAX_SIZE = 10_000_000
+HOOK_LOG_FILE_COUNT = 5
+REPEATED_QUERY_LENGTH = 300
+
+
+def is_instrumentation_enabled():
+	return bool(frappe.conf.get(INSTRUMENTATION_FLAG))
+
+
+def instrument_hook(fn):
+	"""
+	Decorator for the functions registered in hooks.py. When the site config flag
+	dermagroup_lab_instrument_hooks is set, each call records wall time, SQL statement count,
+	SQL time, rows returned and the most repeated statement to the hook log.
+	"""
+
+	@functools.wraps(fn)
+	def wrapper(*args, **kwargs):
+		if not is_instrumentation_enabled():
+			return fn(*args, **kwargs)
+
+		stats = {"sql_count": 0, "sql_time": 0.0, "rows": 0, "queries": {}}
+		_push_stats(stats)
+		start = time.perf_counter()
+		try:
+			return fn(*args, **kwargs)
+		finally:
+			wall_time = time.perf_counter() - start
+			_pop_stats(stats)
+			write_hook_record(_make_record(f"{fn.__module__}.{fn.__qualname__}", args, stats, wall_time))
+
+	wrapper.__instrumented__ = True
+	return wrapper
+
+
+def _push_stats(stats):
+	"""
+	Start counting SQL for a hook call. frappe.db.sql is wrapped once per request while any
+	instrumented hook is running, nested hooks count their statements in every active hook.
+	"""
+	stack = frappe.local.__dict__.setdefault("dermagroup_lab_hook_stats", [])
+	if not stack:
+		original_sql = frappe.db.sql
+
+		def counting_sql(query, *args, **kwargs):
+			start = time.perf_counter()
+			result = original_sql(query, *args, **kwargs)
+			elapsed = time.perf_counter() - start
+			rows = len(result) if isinstance(result, list | tuple) else 0
+			statement = str(query).strip()
+			for active in stack:
+				active["sql_count"] += 1
+				active["sql_time"] += elapsed
+				active["rows"] += rows
+				active["queries"][statement] = active["queries"].get(statement, 0) + 1
+			return result
+
+		frappe.local.dermagroup_lab_patched_sql = (original_sql, "sql" in frappe.db.__dict__)
+		frappe.db.sql = counting_sql
+	stack.append(stats)
+
+
+def _pop_stats(stats):
+	stack = frappe.local.dermagroup_lab_hook_stats
+	stack.remove(stats)
+	if not stack:
+		original_sql, was_instance_attribute = frappe.local.dermagroup_lab_patched_sql
+		if was_instance_attribute:
+			frappe.db.sql = original_sql
+		else:
+			# Drop the instance attribute so the class method is used again
+			del frappe.db.sql
+
+
+def _make_record(hook, args, stats, wall_time):
+	record = {
+		"hook": hook,
+		"wall_time": round(wall_time, 6),
+		"sql_count": stats["sql_count"],
+		"sql_time": round(stats["sql_time"], 6),
+		"rows": stats["rows"],
+		"max_repeated": 0,
+		"repeated_query": None,
+	}
+
+	doc = args[0] if args else None
+	if isinstance(doc, Document):
+		record["doctype"], record["docname"] = doc.doctype, doc.name
+	elif isinstance(doc, list | tuple) and doc and isinstance(doc[0], Document):
+		record["doctype"], record["docname"] = doc[0].doctype, f"{len(doc)} documents"
+
+	if stats["queries"]:
+		query, count = max(stats["queries"].items(), key=lambda item: item[1])
+		record["max_repeated"] = count
+		record["repeated_query"] = query[:REPEATED_QUERY_LENGTH] if count > 1 else None
+
+	return record
+
+
+def get_hook_logger():
+	return frappe.logger(HOOK_LOG, max_size=HOOK_LOG_MAX_SIZE, file_count=HOOK_LOG_FILE_COUNT)
+
+
+def write_hook_record(record):
+	"""
+	Append a hook call record to the rotating site log as one JSON line
+	"""
+	try:
+		get_hook_logger().info(json.dumps(record, default=str))
+	except Exception:
+		# Instrumentation must never break the hook it measures
+		pass
+
+
+def read_hook_records():
+	"""
+	Records of the current site log and its rotated files
+	Returns: list of dicts, one per hook call
+	"""
+	records = []
+	for path in glob.glob(frappe.get_site_path("logs", f"{HOOK_LOG}.log*")):
+		with open(path) as log_file:
+			for line in log_file:
+				# Lines are prefixed by the logger format, the record starts at the first brace
+				start = line.find("{")
+				if start == -1:
+					continue
+				try:
+					records.append(json.loads(line[start:]))
+				except ValueError:
+					continue
+
+	return records
+
+
+def summarize_hook_records(records, limit=20):
+	"""
+	Aggregate hook call records per hook
+	Returns: dict with "slowest" hooks ranked by total wall time and "n_plus_one" hooks ranked
+	by the most times a single statement was repeated within one call
+	"""
+	hooks = {}
+	for record in records:
+		summary = hooks.setdefault(
+			record["hook"],
+			{
+				"hook": record["hook"],
+				"calls": 0,
+				"total_time": 0.0,
+				"max_time": 0.0,
+				"sql_count": 0,
+				"sql_time": 0.0,
+				"rows": 0,
+				"max_repeated": 0,
+				"repeated_query": None,
+			},
+		)
+		summary["calls"] += 1
+		summary["total_time"] += record["wall_time"]
+		summary["max_time"] = max(summary["max_time"], record["wall_time"])
+		summary["sql_count"] += record["sql_count"]
+		summary["sql_time"] += record["sql_time"]
+		summary["rows"] += record["rows"]
+		if record.get("max_repeated", 0) > summary["max_repeated"]:
+			summary["max_repeated"] = record["max_repeated"]
+			summary["repeated_query"] = record.get("repeated_query")
+
+	for summary in hooks.values():
+		summary["avg_time"] = summary["total_time"] / summary["calls"]
+		summary["avg_sql_count"] = summary["sql_count"] / summary["calls"]
+
+	slowest = sorted(hooks.values(), key=lambda summary: summary["total_time"], reverse=True)
+	n_plus_one = sorted(
+		(summary for summary in hooks.values() if summary["max_repeated"] > 1),
+		key=lambda summary: summary["max_repeated"],
+		reverse=True,
+	)
+	return {"slowest": slowest[:limit], "n_plus_one": n_plus_one[:limit]}
+
+
+@frappe.whitelist()
+def get_hook_report(limit=20):
+	"""
+	Slowest hooks and worst N+1 offenders from the hook log
+	Returns: dict with "slowest" and "n_plus_one" lists of per-hook summaries
+	"""
+	frappe.only_for("System Manager")
+	return summarize_hook_records(read_hook_records(), limit=int(limit))
@@ -3,16 +3,19 @@
 
 import frappe
 
+from dermagroup_lab.instrumentation import instrument_hook
 from dermagroup_lab.patches.customize_material_request_status import (
 	execute as customize_material_request_status,
 )
 
 
+@instrument_hook
 def before_migrate():
 	"""Execute before migration"""
 	pass
 
 
+@instrument_hook
 def after_migrate():
 	"""Execute after migration"""
 	from dermagroup_lab.install import (
@@ -20,6 +23,7 @@ def after_migrate():
 		setup_material_request_permissions,
 		setup_required_permissions,
 	)
+	from dermagroup_lab.purchasing.indexes import ensure_indexes
 
 	print("Customizing Material Request Status...")
 	customize_material_request_status()
@@ -33,6 +37,11 @@ def after_migrate():
 	print("Setting up required permissions...")
 	setup_required_permissions()
 
+	print("Provisioning indexes...")
+	for doctype, index_name in ensure_indexes():
+		print(f"Index {index_name} on {doctype} could not be verified")
+		frappe.log_error(f"Index {index_name} on {doctype} could not be verified", "Index Provisioning")
+
 	print("Clearing cache...")
 	frappe.clear_cache()
 	frappe.local.flags.in_migrate = False
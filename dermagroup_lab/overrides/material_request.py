@@ -4,6 +4,9 @@ from erpnext.stock.doctype.material_request.material_request import MaterialRequ
 from frappe import _
 
 from dermagroup_lab.purchasing.enums import ApprovalStatus
+from dermagroup_lab.purchasing.state_machine import validate_transition
+
+APPROVAL_STATUSES = frozenset(approval_status.value for approval_status in ApprovalStatus)
 
 
 class CustomMaterialRequest(MaterialRequest):
@@ -21,8 +24,10 @@ class CustomMaterialRequest(MaterialRequest):
 
 		# Validar que el status sea uno de los valores permitidos
 		if self.status:
-			allowed_statuses = [approval_status.value for approval_status in ApprovalStatus]
-			validate_status(self.status, allowed_statuses)
+			validate_status(self.status, list(APPROVAL_STATUSES))
+
+		# Validar que el cambio de status sea una transición permitida
+		validate_transition(self)
 
 		# Guardar el status actual antes de ejecutar validación del padre
 		original_status = self.status
@@ -46,28 +51,41 @@ class CustomMaterialRequest(MaterialRequest):
 		if not self.status and self.docstatus == 0:
 			self.status = ApprovalStatus.PENDING_APPROVAL.value
 
+	def before_update_after_submit(self):
+		"""
+		Validar las transiciones de status en documentos enviados
+		"""
+		if hasattr(super(), "before_update_after_submit"):
+			super().before_update_after_submit()
+
+		validate_transition(self)
+
 	def set_status(self, update=False, status=None, update_modified=True):
 		"""
-		Sobrescribe set_status para usar valores personalizados
+		Sobrescribe set_status para usar valores personalizados.
+		Solo escribe en la base de datos si el status cambia fuera de submit/cancel,
+		donde el guardado del documento ya lo persiste en un único UPDATE.
 		"""
-		# Si ya tiene status y queremos actualizar, mantener el actual
-		if self.status and update:
-			status = self.status
-		# Si se pasa un status específico, usarlo
-		elif status:
+		previous_status = self.status
+
+		# Al actualizar solo se aceptan status personalizados, los del core se ignoran
+		if status and (not update or status in APPROVAL_STATUSES):
 			self.status = status
 		# Si no hay status, establecer el inicial
 		elif not self.status:
-			status = ApprovalStatus.PENDING_APPROVAL.value
-			self.status = status
+			self.status = ApprovalStatus.PENDING_APPROVAL.value
 
-		# Actualizar en la base de datos si se solicita
-		if update:
-			self.db_set("status", status, update_modified=update_modified)
+		# Actualizar en la base de datos si se solicita y hay cambio
+		if (
+			update
+			and self.status != previous_status
+			and getattr(self, "_action", None) not in ("submit", "cancel")
+		):
+			self.db_set("status", self.status, update_modified=update_modified)
 
-	def on_submit(self):
+	def before_submit(self):
 		"""
-		Validar que esté aprobado antes de enviar y mantener el status
+		Validar que esté aprobado antes de enviar, el status se guarda con el submit
 		"""
 		# Validar que el status sea "Approved" antes de permitir submit
 		if self.status != ApprovalStatus.APPROVED.value:
@@ -77,16 +95,7 @@ class CustomMaterialRequest(MaterialRequest):
 				)
 			)
 
-		# Guardar el status antes del submit
-		current_status = self.status
-
-		# Ejecutar el submit original
-		super().on_submit()
-
-		# Restaurar el status después del submit
-		if current_status:
-			self.db_set("status", current_status)
-			self.status = current_status
+		super().before_submit()
 
 	def set_title(self):
 		"""
@@ -96,10 +105,9 @@ class CustomMaterialRequest(MaterialRequest):
 			items = ", ".join([d.item_name for d in self.items][:3])
 			self.title = _("{0} Request for {1}").format(_(self.material_request_type), items)[:100]
 
-	def on_cancel(self):
+	def before_cancel(self):
 		"""
-		Actualizar el status al cancelar
+		Establecer el status cancelado antes de guardar, el cancel lo persiste en un único UPDATE
 		"""
-		super().on_cancel()
+		super().before_cancel()
 		self.status = ApprovalStatus.CANCELLED.value
-		self.db_set("status", ApprovalStatus.CANCELLED.value)
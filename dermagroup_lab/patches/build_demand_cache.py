@@ -0,0 +1,11 @@
+import frappe
+
+
+def execute():
+	"""Build the Work Order demand cache in the background from the open Work Orders"""
+	frappe.enqueue(
+		"dermagroup_lab.purchasing.demand.rebuild_demand_cache",
+		queue="long",
+		timeout=3600,
+		enqueue_after_commit=True,
+	)
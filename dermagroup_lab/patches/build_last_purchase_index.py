@@ -0,0 +1,11 @@
+import frappe
+
+
+def execute():
+	"""Build the Item Last Purchase index in the background, lookups scan history until it is done"""
+	frappe.enqueue(
+		"dermagroup_lab.purchasing.last_purchase.rebuild_last_purchase_index",
+		queue="long",
+		timeout=3600,
+		enqueue_after_commit=True,
+	)
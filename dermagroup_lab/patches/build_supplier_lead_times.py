@@ -0,0 +1,11 @@
+import frappe
+
+
+def execute():
+	"""Compute the supplier lead time statistics in the background from the receipt history"""
+	frappe.enqueue(
+		"dermagroup_lab.purchasing.lead_times.rebuild_supplier_lead_times",
+		queue="long",
+		timeout=3600,
+		enqueue_after_commit=True,
+	)
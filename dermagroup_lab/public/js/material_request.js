@@ -41,22 +41,20 @@ frappe.ui.form.on("Material Request", {
 			form.page.set_indicator(__(doc.status), STATUS_CONFIG[doc.status] || "gray");
 		}
 
-		// Get user roles
-		const userRoles = frappe.user_roles || [];
-		const hasProductionAccess = userRoles.includes("Production Manager");
-		const hasPurchasingAccess = userRoles.includes("Purchasing Manager");
-
-		// Handle document state-specific actions
-		if (doc.docstatus === 1) {
-			handleSubmittedDocument(form, doc, hasPurchasingAccess);
-		} else if (doc.docstatus === 0) {
-			handleDraftDocument(form, doc, hasProductionAccess, hasPurchasingAccess);
+		// Add status actions from the server transition table
+		if (!doc.__islocal) {
+			setupStatusActions(form);
 		}
 
 		// Auto-fill supplier for new purchase requests
 		if (doc.__islocal && doc.material_request_type === "Purchase") {
 			autoFillSupplierFromLastPurchase(form);
 		}
+
+		// Show stock projections for every row
+		if (doc.docstatus === 0 && doc.material_request_type === "Purchase") {
+			refreshStockProjections(form);
+		}
 	},
 
 	/**
@@ -112,44 +110,44 @@ function setupDatePickerConstraints(form) {
 }
 
 /**
- * Handles actions for submitted documents
+ * Fetches the status transition table once per page load
  */
-function handleSubmittedDocument(form, doc, hasPurchasingAccess) {
-	if (!hasPurchasingAccess) return;
-
-	const { status } = doc;
-
-	switch (status) {
-		case "Approved":
-			addActionButton(form, "Send to Supplier", () =>
-				updateStatus(form, "Sent to Supplier")
-			);
-			break;
-
-		case "Sent to Supplier":
-			addActionButton(form, "Confirm Receipt", () => updateStatus(form, "Confirmed"));
-			addActionButton(form, "Mark Pending Delivery", () =>
-				updateStatus(form, "Pending Delivery")
-			);
-			break;
-
-		case "Pending Delivery":
-			addActionButton(form, "Confirm Receipt", () => updateStatus(form, "Confirmed"));
-			break;
+function getTransitionTable() {
+	if (!getTransitionTable.promise) {
+		getTransitionTable.promise = frappe
+			.xcall("dermagroup_lab.purchasing.state_machine.get_transition_table")
+			.catch((error) => {
+				getTransitionTable.promise = null;
+				throw error;
+			});
 	}
+	return getTransitionTable.promise;
 }
 
 /**
- * Handles actions for draft documents
+ * Adds an action button for every transition available to the user
  */
-function handleDraftDocument(form, doc, hasProductionAccess, hasPurchasingAccess) {
-	const { status } = doc;
-
-	if (hasPurchasingAccess) {
-		if (status === "Pending Approval") {
-			addActionButton(form, "Approve", () => updateStatus(form, "Approved", true));
-		}
-	}
+function setupStatusActions(form) {
+	const { doc } = form;
+	const userRoles = frappe.user_roles || [];
+
+	getTransitionTable().then((transitions) => {
+		// The form may have moved on while the table was loading
+		if (form.doc !== doc) return;
+
+		transitions
+			.filter(
+				(transition) =>
+					transition.docstatus === doc.docstatus &&
+					transition.from_status === doc.status &&
+					userRoles.includes(transition.role)
+			)
+			.forEach((transition) => {
+				addActionButton(form, transition.label, () =>
+					updateStatus(form, transition.to_status, doc.docstatus === 0)
+				);
+			});
+	});
 }
 
 /**
@@ -161,14 +159,16 @@ function updateStatus(form, status, shouldSave = false) {
 		form.save();
 	} else {
 		frappe.call({
-			method: "frappe.client.set_value",
+			method: "dermagroup_lab.purchasing.status.update_status",
 			args: {
-				doctype: "Material Request",
 				name: form.doc.name,
-				fieldname: "status",
-				value: status,
+				status: status,
+			},
+			callback: (response) => {
+				if (!response.message) return;
+				frappe.model.sync(response.message);
+				form.refresh();
 			},
-			callback: () => form.reload_doc(),
 		});
 	}
 }
@@ -180,44 +180,101 @@ function addActionButton(form, label, onClick, group = "Actions") {
 	form.add_custom_button(__(label), onClick, __(group));
 }
 
+const LAST_PURCHASE_DEBOUNCE_MS = 300;
+
 /**
- * Autofills purchase details for an item
+ * Queues a row for last purchase autofill, so bulk edits are resolved in one call
  */
-function autofillLastPurchase(form, row, rowName) {
+function queueLastPurchaseAutofill(form, cdt, cdn) {
 	if (!form?.doc || form.doc.material_request_type !== "Purchase") return;
 
-	const rowData = locals[row]?.[rowName];
-	if (!rowData?.item_code) return;
+	form.__last_purchase_pending = form.__last_purchase_pending || new Set();
+	form.__last_purchase_pending.add(cdn);
 
-	frappe.call({
-		method: "dermagroup_lab.purchasing.utils.get_last_purchase_details",
-		args: {
+	clearTimeout(form.__last_purchase_timer);
+	form.__last_purchase_timer = setTimeout(
+		() => autofillLastPurchase(form, cdt),
+		LAST_PURCHASE_DEBOUNCE_MS
+	);
+}
+
+/**
+ * Autofills purchase details for every queued row
+ */
+function autofillLastPurchase(form, cdt) {
+	const rowNames = [...(form.__last_purchase_pending || [])];
+	form.__last_purchase_pending?.clear();
+
+	const rows = rowNames
+		.map((rowName) => locals[cdt]?.[rowName])
+		.filter((rowData) => rowData?.item_code)
+		.map((rowData) => ({
+			name: rowData.name,
 			item_code: rowData.item_code,
 			warehouse: rowData.warehouse,
+		}));
+	if (!rows.length) return;
+
+	frappe.call({
+		method: "dermagroup_lab.purchasing.utils.get_last_purchase_details_bulk",
+		args: {
+			rows: rows.map((rowData) => [rowData.item_code, rowData.warehouse || null]),
 		},
 		callback: (response) => {
-			const currentRow = locals[row]?.[rowName];
-			if (!currentRow?.item_code || currentRow.item_code !== rowData.item_code) return;
-
-			const { message: data = {} } = response || {};
-			if (data.qty == null && data.rate == null) return;
-
-			if (data.qty != null) {
-				frappe.model.set_value(row, rowName, "qty", data.qty);
-			}
-			if (data.rate != null) {
-				frappe.model.set_value(row, rowName, "rate", data.rate);
-			}
+			const results = response?.message || [];
+
+			rows.forEach((rowData, index) => {
+				const data = results[index] || {};
+				const currentRow = locals[cdt]?.[rowData.name];
+				if (!currentRow?.item_code || currentRow.item_code !== rowData.item_code) return;
+				if (data.qty == null && data.rate == null) return;
+
+				if (data.qty != null) {
+					frappe.model.set_value(cdt, rowData.name, "qty", data.qty);
+				}
+				if (data.rate != null) {
+					frappe.model.set_value(cdt, rowData.name, "rate", data.rate);
+				}
+			});
 		},
 	});
 }
 
 // Item table events
 frappe.ui.form.on("Material Request Item", {
-	item_code: (form, cdt, cdn) => autofillLastPurchase(form, cdt, cdn),
-	warehouse: (form, cdt, cdn) => autofillLastPurchase(form, cdt, cdn),
+	item_code: (form, cdt, cdn) => queueLastPurchaseAutofill(form, cdt, cdn),
+	warehouse: (form, cdt, cdn) => queueLastPurchaseAutofill(form, cdt, cdn),
 });
 
+/**
+ * Fetches stock projections for every item row in a single call
+ */
+function refreshStockProjections(form) {
+	const rows = (form.doc.items || []).filter((row) => row.item_code && row.warehouse);
+	if (!rows.length) return;
+
+	frappe.call({
+		method: "dermagroup_lab.purchasing.utils.get_stock_projections",
+		args: {
+			pairs: rows.map((row) => [row.item_code, row.warehouse]),
+		},
+		callback: (response) => {
+			const projections = response.message || [];
+
+			rows.forEach((row, index) => {
+				const projection = projections[index];
+				if (!projection || projection.item_code !== row.item_code) return;
+
+				// Display only values, do not mark the form as dirty
+				row.actual_qty = projection.actual_qty;
+				row.projected_qty = projection.projected_qty;
+			});
+
+			form.refresh_field("items");
+		},
+	});
+}
+
 /**
  * Auto-fills supplier from last purchase order
  */
@@ -18,4 +18,58 @@ frappe.listview_settings["Material Request"] = {
 			return [__(doc.status), "grey", `status,=,${doc.status}`];
 		}
 	},
+	onload: function (listview) {
+		const userRoles = frappe.user_roles || [];
+
+		// One bulk action per target status from the server transition table
+		frappe
+			.xcall("dermagroup_lab.purchasing.state_machine.get_transition_table")
+			.then((transitions) => {
+				const actions = new Map();
+				transitions
+					.filter((transition) => userRoles.includes(transition.role))
+					.forEach((transition) => actions.set(transition.to_status, transition.label));
+
+				actions.forEach((label, status) => {
+					listview.page.add_action_item(__(label), () =>
+						bulkUpdateStatus(listview, status)
+					);
+				});
+			});
+	},
 };
+
+/**
+ * Applies a status transition to every selected Material Request in one request
+ */
+function bulkUpdateStatus(listview, status) {
+	const names = listview.get_checked_items(true);
+	if (!names.length) return;
+
+	frappe.call({
+		method: "dermagroup_lab.purchasing.status.bulk_update_status",
+		args: { names, status },
+		freeze: true,
+		callback: (response) => {
+			const results = response.message || [];
+			const failed = results.filter((result) => !result.success);
+
+			if (failed.length) {
+				const rows = failed.map((result) => `<li>${result.name}: ${result.message}</li>`);
+				frappe.msgprint({
+					title: __("{0} of {1} updated", [results.length - failed.length, results.length]),
+					message: `<ul>${rows.join("")}</ul>`,
+					indicator: "orange",
+				});
+			} else {
+				frappe.show_alert({
+					message: __("{0} Material Requests updated", [results.length]),
+					indicator: "green",
+				});
+			}
+
+			listview.clear_checked_items();
+			listview.refresh();
+		},
+	});
+}
@@ -0,0 +1,51 @@
+/**
+ * Handles Work Order form customizations
+ */
+
+frappe.ui.form.on("Work Order", {
+	/**
+	 * Listen for the shortage Material Requests created after submit
+	 */
+	setup: function (form) {
+		frappe.realtime.off("shortage_material_requests");
+		frappe.realtime.on("shortage_material_requests", (data) => {
+			showShortageMaterialRequests(form, data);
+		});
+	},
+});
+
+/**
+ * Tell the planner which Material Requests were created for a Work Order shortage
+ */
+function showShortageMaterialRequests(form, data) {
+	if (data.error) {
+		frappe.msgprint({ title: __("Stock Shortage"), message: data.error, indicator: "red" });
+		return;
+	}
+
+	const lines = (data.material_requests || []).map(
+		(mr) =>
+			`• ${frappe.utils.get_form_link("Material Request", mr.name, true)}: ${mr.items.join(", ")}`
+	);
+	if (data.skipped && data.skipped.length) {
+		lines.push(
+			__("Skipped because a similar Material Request exists in the last {0} days: {1}", [
+				data.duplicate_days,
+				data.skipped.join(", "),
+			])
+		);
+	}
+	if (!lines.length) {
+		return;
+	}
+
+	frappe.msgprint({
+		title: __("Material Requests created for {0}", [data.work_order]),
+		message: lines.join("<br>"),
+		indicator: "green",
+	});
+
+	if (form.doc.name === data.work_order) {
+		form.reload_doc();
+	}
+}
@@ -1,18 +1,27 @@
 import frappe
 from frappe import _
 
-from dermagroup_lab.purchasing.validations import check_duplicate_requests
+from dermagroup_lab.instrumentation import instrument_hook
+from dermagroup_lab.purchasing.reservations import claim_reservations, get_material_request_pairs
+from dermagroup_lab.purchasing.validations import check_duplicate_requests_bulk
 
 
+@instrument_hook
 def before_insert_material_request(doc, method=None):
 	if doc.doctype != "Material Request":
 		return
 	if doc.get("material_request_type") != "Purchase":
 		return
+	# Set by bulk creation paths that already checked and reserved every item
+	if doc.flags.skip_duplicate_check:
+		return
 
 	item_codes = {row.get("item_code") for row in (doc.get("items") or []) if row.get("item_code")}
 	supplier = doc.get("suggested_supplier")
-	for item_code in item_codes:
-		duplicates = check_duplicate_requests(item_code, supplier)
-		if duplicates:
-			frappe.throw(_("Similar orders found within 3 days"))
+	if check_duplicate_requests_bulk(item_codes, supplier):
+		frappe.throw(_("Similar orders found within 3 days"))
+
+	# Reserve the items so a concurrent request cannot pass the same check
+	pairs = get_material_request_pairs(doc)
+	if claim_reservations(pairs, doc.transaction_date, supplier) != pairs:
+		frappe.throw(_("Similar orders found within 3 days"))
@@ -0,0 +1,111 @@
+import frappe
+from frappe.utils import flt
+
+from dermagroup_lab.instrumentation import instrument_hook
+
+BOM_EXPLOSION_CACHE_KEY = "dermagroup_lab:bom_explosion"
+MAX_BOM_DEPTH = 20
+
+
+def get_exploded_bom(bom_no):
+	"""
+	Leaf items of a multi-level BOM, cached by BOM name and modified timestamp
+	Returns: list of dicts with item_code, source_warehouse, stock_uom, qty_per_unit
+	"""
+	modified = frappe.db.get_value("BOM", bom_no, "modified")
+	if not modified:
+		return []
+
+	cache_field = f"{bom_no}::{modified}"
+	exploded = frappe.cache().hget(BOM_EXPLOSION_CACHE_KEY, cache_field)
+	if exploded is None:
+		exploded = explode_bom(bom_no)
+		frappe.cache().hset(BOM_EXPLOSION_CACHE_KEY, cache_field, exploded)
+
+	return exploded
+
+
+def explode_bom(bom_no):
+	"""
+	Resolve the full BOM tree in a single recursive query and aggregate the stock qty of each
+	leaf item per unit of the BOM's item. Rows with a sub-assembly BOM are exploded unless
+	they are marked "Do Not Explode"; sub-assemblies at MAX_BOM_DEPTH are kept as leaves.
+	Returns: list of dicts with item_code, source_warehouse, stock_uom, qty_per_unit
+	"""
+	rows = frappe.db.sql(
+		"""
+		WITH RECURSIVE exploded AS (
+			SELECT
+				bi.item_code,
+				bi.bom_no,
+				bi.do_not_explode,
+				bi.source_warehouse,
+				bi.stock_uom,
+				CAST(bi.stock_qty / IF(b.quantity > 0, b.quantity, 1) AS DECIMAL(30, 9)) AS qty_per_unit,
+				1 AS depth
+			FROM
+				`tabBOM Item` bi
+			INNER JOIN
+				`tabBOM` b ON b.name = bi.parent
+			WHERE
+				bi.parent = %(bom_no)s
+				AND bi.parenttype = 'BOM'
+
+			UNION ALL
+
+			SELECT
+				bi.item_code,
+				bi.bom_no,
+				bi.do_not_explode,
+				bi.source_warehouse,
+				bi.stock_uom,
+				CAST(
+					e.qty_per_unit * bi.stock_qty / IF(b.quantity > 0, b.quantity, 1) AS DECIMAL(30, 9)
+				) AS qty_per_unit,
+				e.depth + 1 AS depth
+			FROM
+				exploded e
+			INNER JOIN
+				`tabBOM` b ON b.name = e.bom_no
+			INNER JOIN
+				`tabBOM Item` bi ON bi.parent = b.name AND bi.parenttype = 'BOM'
+			WHERE
+				IFNULL(e.bom_no, '') != ''
+				AND e.do_not_explode = 0
+				AND e.depth < %(max_depth)s
+		)
+		SELECT
+			item_code,
+			source_warehouse,
+			stock_uom,
+			SUM(qty_per_unit) AS qty_per_unit
+		FROM
+			exploded
+		WHERE
+			IFNULL(bom_no, '') = ''
+			OR do_not_explode = 1
+			OR depth >= %(max_depth)s
+		GROUP BY
+			item_code, source_warehouse, stock_uom
+		""",
+		{"bom_no": bom_no, "max_depth": MAX_BOM_DEPTH},
+		as_dict=True,
+	)
+
+	return [
+		{
+			"item_code": row.item_code,
+			"source_warehouse": row.source_warehouse or None,
+			"stock_uom": row.stock_uom,
+			"qty_per_unit": flt(row.qty_per_unit),
+		}
+		for row in rows
+	]
+
+
+@instrument_hook
+def clear_bom_explosion_cache(doc=None, method=None):
+	"""
+	Hook for BOM changes - a sub-assembly change affects every BOM above it, so drop all entries
+	"""
+	frappe.cache().delete_value(BOM_EXPLOSION_CACHE_KEY)
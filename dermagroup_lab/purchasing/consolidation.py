@@ -0,0 +1,112 @@
+import frappe
+from frappe.utils import add_days, nowdate
+
+from dermagroup_lab.purchasing.last_purchase import get_last_purchase_map
+from dermagroup_lab.purchasing.lead_times import get_supplier_lead_time_map
+from dermagroup_lab.purchasing.memo import get_item_lead_time, get_supplier_email, get_warehouse_company
+from dermagroup_lab.purchasing.notifications import notify_purchasing_of_material_request
+from dermagroup_lab.purchasing.reservations import claim_reservations
+
+DEFAULT_LEAD_TIME_DAYS = 7
+
+
+def consolidate_shortages(shortages):
+	"""
+	Group shortage lines by company, target warehouse and suggested supplier, using the
+	supplier of the last purchase of each item where one is known
+	shortages: list of dicts with item_code, warehouse, company, qty and optional lead_time_days
+	Returns: list of dicts with company, warehouse, supplier, items
+	"""
+	last_purchases = get_last_purchase_map({(row["item_code"], row["warehouse"]) for row in shortages})
+
+	groups = {}
+	for row in shortages:
+		supplier = last_purchases.get((row["item_code"], row["warehouse"]), {}).get("supplier")
+		company = row.get("company") or get_warehouse_company(row["warehouse"])
+		group = groups.setdefault(
+			(company, row["warehouse"], supplier),
+			{"company": company, "warehouse": row["warehouse"], "supplier": supplier, "items": []},
+		)
+		group["items"].append(row)
+
+	return list(groups.values())
+
+
+def get_group_lead_times(group, purchase_type=None):
+	"""
+	Days until each line of a shortage group is required and expected to arrive. The 90th
+	percentile and median of the supplier's past deliveries of the item are used where there is
+	history, otherwise the item lead time or DEFAULT_LEAD_TIME_DAYS for both.
+	Returns: list of required-by days and list of arrival days, in the order of group["items"]
+	"""
+	supplier_lead_times = {}
+	if group["supplier"]:
+		supplier_lead_times = get_supplier_lead_time_map(
+			{(group["supplier"], row["item_code"], purchase_type) for row in group["items"]}
+		)
+
+	lead_times, arrival_times = [], []
+	for row in group["items"]:
+		stats = supplier_lead_times.get((group["supplier"], row["item_code"], purchase_type))
+		if stats:
+			lead_times.append(stats["p90_days"])
+			arrival_times.append(stats["median_days"])
+			continue
+
+		lead_time_days = int(
+			row.get("lead_time_days") or get_item_lead_time(row["item_code"]) or DEFAULT_LEAD_TIME_DAYS
+		)
+		lead_times.append(lead_time_days)
+		arrival_times.append(lead_time_days)
+
+	return lead_times, arrival_times
+
+
+def create_consolidated_material_requests(groups):
+	"""
+	Create and submit one multi-row Material Request per shortage group. Duplicates must have
+	been filtered by the caller, so the per-document duplicate check is skipped. Each item and
+	warehouse is reserved first, lines already reserved by a concurrent request are dropped.
+	Returns: list of (Material Request name, group) tuples
+	"""
+	created = []
+	for group in groups:
+		claimed = claim_reservations(
+			((row["item_code"], row["warehouse"]) for row in group["items"]), supplier=group["supplier"]
+		)
+		group["items"] = [row for row in group["items"] if (row["item_code"], row["warehouse"]) in claimed]
+		if not group["items"]:
+			continue
+
+		mr = frappe.new_doc("Material Request")
+		mr.material_request_type = "Purchase"
+		mr.company = group["company"]
+		mr.transaction_date = nowdate()
+		mr.auto_created_via_reorder = 1
+		if group["supplier"]:
+			mr.suggested_supplier = group["supplier"]
+			mr.supplier_email = get_supplier_email(group["supplier"])
+
+		lead_times, arrival_times = get_group_lead_times(group, mr.get("purchase_type"))
+		mr.schedule_date = add_days(nowdate(), max(lead_times))
+		mr.estimated_arrival_date = add_days(nowdate(), max(max(arrival_times), 1))
+
+		for row, lead_time_days in zip(group["items"], lead_times, strict=True):
+			mr.append(
+				"items",
+				{
+					"item_code": row["item_code"],
+					"qty": row["qty"],
+					"warehouse": row["warehouse"],
+					"schedule_date": add_days(nowdate(), lead_time_days),
+				},
+			)
+
+		mr.flags.ignore_mandatory = True
+		mr.flags.skip_duplicate_check = True
+		mr.insert()
+		mr.submit()
+		notify_purchasing_of_material_request(mr)
+		created.append((mr.name, group))
+
+	return created
@@ -0,0 +1,320 @@
+import hashlib
+
+import frappe
+from frappe.utils import flt, now
+
+from dermagroup_lab.instrumentation import instrument_hook
+from dermagroup_lab.purchasing.bom import get_exploded_bom
+
+# Stock Entry purposes that take Work Order materials out of their source warehouse
+CONSUMING_PURPOSES = (
+	"Material Transfer for Manufacture",
+	"Manufacture",
+	"Material Consumption for Manufacture",
+)
+# Work Order statuses whose remaining requirements no longer reserve stock
+RELEASED_STATUSES = ("Completed", "Closed")
+
+
+def get_demand_key(*parts):
+	"""
+	Primary key of an Item Demand row (item, warehouse) or Work Order Demand row
+	(work order, item, warehouse)
+	"""
+	return hashlib.sha1("\x1f".join(parts).encode()).hexdigest()
+
+
+def get_work_order_requirements(work_order):
+	"""
+	Leaf requirements of the full BOM tree of a Work Order, aggregated per item and warehouse
+	Returns: dict of (item_code, warehouse) -> dict with required_qty, stock_uom
+	"""
+	requirements = {}
+	for leaf in get_exploded_bom(work_order.bom_no):
+		warehouse = leaf["source_warehouse"] or work_order.source_warehouse
+		if not warehouse:
+			continue
+
+		requirement = requirements.setdefault(
+			(leaf["item_code"], warehouse), {"required_qty": 0, "stock_uom": leaf["stock_uom"]}
+		)
+		requirement["required_qty"] += leaf["qty_per_unit"] * flt(work_order.qty)
+
+	return requirements
+
+
+def get_open_demand_map(pairs):
+	"""
+	Open requirements of submitted Work Orders per (item_code, warehouse), one primary key lookup
+	Returns: dict of (item_code, warehouse) -> open qty, only for pairs with demand
+	"""
+	keys = tuple(
+		{get_demand_key(item_code, warehouse) for item_code, warehouse in pairs if item_code and warehouse}
+	)
+	if not keys:
+		return {}
+
+	return {
+		(row.item_code, row.warehouse): max(flt(row.open_qty), 0)
+		for row in frappe.db.sql(
+			"""
+			SELECT
+				item_code, warehouse, open_qty
+			FROM
+				`tabItem Demand`
+			WHERE
+				name IN %(keys)s
+			""",
+			{"keys": keys},
+			as_dict=True,
+		)
+	}
+
+
+@instrument_hook
+def record_work_order_demand(doc, method=None):
+	"""
+	Hook for Work Order on_submit - add its requirements to the demand cache
+	"""
+	requirements = get_work_order_requirements(doc)
+	if not requirements:
+		return
+
+	timestamp = now()
+	frappe.db.bulk_insert(
+		"Work Order Demand",
+		fields=[
+			"name",
+			"creation",
+			"modified",
+			"owner",
+			"modified_by",
+			"work_order",
+			"item_code",
+			"warehouse",
+			"required_qty",
+			"consumed_qty",
+			"open_qty",
+		],
+		values=[
+			(
+				get_demand_key(doc.name, item_code, warehouse),
+				timestamp,
+				timestamp,
+				frappe.session.user,
+				frappe.session.user,
+				doc.name,
+				item_code,
+				warehouse,
+				requirement["required_qty"],
+				0,
+				requirement["required_qty"],
+			)
+			for (item_code, warehouse), requirement in requirements.items()
+		],
+		ignore_duplicates=True,
+	)
+	_add_to_item_demand({pair: requirement["required_qty"] for pair, requirement in requirements.items()})
+
+
+@instrument_hook
+def release_work_order_demand(doc, method=None):
+	"""
+	Hook for Work Order on_cancel and on_change - drop its remaining requirements from the demand
+	cache once it is cancelled, completed or closed, and record them again when a submitted
+	Work Order leaves those statuses, e.g. when its Manufacture entry is cancelled
+	"""
+	if doc.docstatus != 2 and doc.status not in RELEASED_STATUSES:
+		if doc.docstatus == 1 and not frappe.db.exists("Work Order Demand", {"work_order": doc.name}):
+			restore_work_order_demand(doc)
+		return
+
+	rows = frappe.get_all(
+		"Work Order Demand",
+		filters={"work_order": doc.name},
+		fields=["name", "item_code", "warehouse", "open_qty"],
+	)
+	if not rows:
+		return
+
+	frappe.db.delete("Work Order Demand", {"name": ("in", [row.name for row in rows])})
+	_add_to_item_demand({(row.item_code, row.warehouse): -flt(row.open_qty) for row in rows})
+
+
+@instrument_hook
+def update_demand_from_stock_entry(doc, method=None):
+	"""
+	Hook for Stock Entry on_submit/on_cancel - materials taken from the source warehouse of a
+	Work Order requirement are no longer open demand, and come back when the entry is cancelled
+	"""
+	if not doc.get("work_order") or doc.purpose not in CONSUMING_PURPOSES:
+		return
+
+	sign = -1 if method == "on_cancel" or doc.docstatus == 2 else 1
+	consumed = {}
+	for row in doc.items:
+		if row.s_warehouse and not row.get("is_finished_item"):
+			pair = (row.item_code, row.s_warehouse)
+			consumed[pair] = consumed.get(pair, 0) + sign * flt(row.transfer_qty or row.qty)
+
+	# The demand restored while this entry was cancelled already excludes it
+	if doc.work_order in (frappe.flags.restored_work_order_demand or ()):
+		return
+
+	keys = {get_demand_key(doc.work_order, *pair): pair for pair in consumed}
+	if not keys:
+		return
+
+	rows = frappe.db.sql(
+		"""
+		SELECT
+			name, item_code, warehouse, required_qty, consumed_qty, open_qty
+		FROM
+			`tabWork Order Demand`
+		WHERE
+			name IN %(keys)s
+		FOR UPDATE
+		""",
+		{"keys": tuple(keys)},
+		as_dict=True,
+	)
+
+	deltas = {}
+	for row in rows:
+		consumed_qty = max(flt(row.consumed_qty) + consumed[keys[row.name]], 0)
+		open_qty = max(flt(row.required_qty) - consumed_qty, 0)
+		frappe.db.set_value(
+			"Work Order Demand",
+			row.name,
+			{"consumed_qty": consumed_qty, "open_qty": open_qty},
+			update_modified=False,
+		)
+		deltas[(row.item_code, row.warehouse)] = open_qty - flt(row.open_qty)
+
+	_add_to_item_demand(deltas)
+
+
+def _add_to_item_demand(deltas):
+	"""
+	Apply open qty deltas to the per item and warehouse aggregates in one atomic upsert, so
+	concurrent Work Orders on the same item never lose an update
+	"""
+	deltas = {pair: delta for pair, delta in deltas.items() if delta}
+	if not deltas:
+		return
+
+	timestamp = now()
+	values = []
+	for (item_code, warehouse), delta in deltas.items():
+		values.extend(
+			(
+				get_demand_key(item_code, warehouse),
+				timestamp,
+				timestamp,
+				frappe.session.user,
+				frappe.session.user,
+				item_code,
+				warehouse,
+				delta,
+			)
+		)
+
+	frappe.db.sql(
+		f"""
+		INSERT INTO `tabItem Demand`
+			(name, creation, modified, owner, modified_by, item_code, warehouse, open_qty)
+		VALUES
+			{", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s)"] * len(deltas))}
+		ON DUPLICATE KEY UPDATE
+			open_qty = GREATEST(open_qty + VALUES(open_qty), 0),
+			modified = VALUES(modified)
+		""",
+		values,
+	)
+
+
+def get_consumed_quantities(work_order=None):
+	"""
+	Materials taken by submitted consuming Stock Entries from the source warehouse of open
+	Work Orders, or of one Work Order
+	Returns: dict of (work_order, item_code, warehouse) -> qty
+	"""
+	conditions = "AND wo.status NOT IN %(released)s"
+	if work_order:
+		conditions = "AND wo.name = %(work_order)s"
+
+	return {
+		(row.work_order, row.item_code, row.warehouse): flt(row.qty)
+		for row in frappe.db.sql(
+			f"""
+			SELECT
+				se.work_order, sed.item_code, sed.s_warehouse AS warehouse, SUM(sed.transfer_qty) AS qty
+			FROM
+				`tabStock Entry` se
+			INNER JOIN
+				`tabStock Entry Detail` sed ON sed.parent = se.name
+			INNER JOIN
+				`tabWork Order` wo ON wo.name = se.work_order
+			WHERE
+				se.docstatus = 1
+				AND se.purpose IN %(purposes)s
+				AND IFNULL(sed.s_warehouse, '') != ''
+				AND IFNULL(sed.is_finished_item, 0) = 0
+				AND wo.docstatus = 1
+				{conditions}
+			GROUP BY
+				se.work_order, sed.item_code, sed.s_warehouse
+			""",
+			{"purposes": CONSUMING_PURPOSES, "released": RELEASED_STATUSES, "work_order": work_order},
+			as_dict=True,
+		)
+	}
+
+
+def _record_open_demand(work_order, consumed):
+	"""
+	Record the requirements of a Work Order less the materials already taken for it
+	"""
+	record_work_order_demand(work_order)
+	for (item_code, warehouse), requirement in get_work_order_requirements(work_order).items():
+		consumed_qty = consumed.get((work_order.name, item_code, warehouse))
+		if not consumed_qty:
+			continue
+
+		open_qty = max(requirement["required_qty"] - consumed_qty, 0)
+		frappe.db.set_value(
+			"Work Order Demand",
+			get_demand_key(work_order.name, item_code, warehouse),
+			{"consumed_qty": consumed_qty, "open_qty": open_qty},
+			update_modified=False,
+		)
+		_add_to_item_demand({(item_code, warehouse): open_qty - requirement["required_qty"]})
+
+
+def restore_work_order_demand(work_order):
+	"""
+	Record the remaining requirements of a Work Order that was reopened after its demand was
+	released
+	"""
+	_record_open_demand(work_order, get_consumed_quantities(work_order.name))
+	frappe.flags.restored_work_order_demand = {
+		*(frappe.flags.restored_work_order_demand or ()),
+		work_order.name,
+	}
+
+
+def rebuild_demand_cache():
+	"""
+	Recompute the demand cache from the open Work Orders and the materials already taken for them
+	"""
+	frappe.db.delete("Work Order Demand")
+	frappe.db.delete("Item Demand")
+
+	consumed = get_consumed_quantities()
+	for name in frappe.get_all(
+		"Work Order",
+		filters={"docstatus": 1, "status": ("not in", RELEASED_STATUSES)},
+		pluck="name",
+	):
+		_record_open_demand(frappe.get_doc("Work Order", name), consumed)
+		frappe.db.commit()
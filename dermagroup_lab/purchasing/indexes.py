@@ -0,0 +1,71 @@
+import frappe
+
+# doctype, index name, columns - composite indexes for the app's hot queries
+APP_INDEXES = (
+	# Duplicate check: Material Request Items of a set of items, joined to their parent
+	("Material Request Item", "dgl_item_code_parent", ("item_code", "parent", "warehouse", "qty")),
+	# Recently requested items and duplicate check: Purchase requests since a date
+	(
+		"Material Request",
+		"dgl_type_transaction_date",
+		("material_request_type", "transaction_date", "docstatus", "suggested_supplier"),
+	),
+	# Last purchase lookups: latest submitted receipt/order per item and warehouse
+	(
+		"Purchase Receipt Item",
+		"dgl_item_warehouse_creation",
+		("item_code", "warehouse", "docstatus", "creation"),
+	),
+	(
+		"Purchase Order Item",
+		"dgl_item_warehouse_schedule_date",
+		("item_code", "warehouse", "docstatus", "schedule_date"),
+	),
+	# Daily reorder: purchase reorder levels per item, in item order
+	(
+		"Item Reorder",
+		"dgl_type_parent_warehouse",
+		("material_request_type", "parent", "warehouse", "warehouse_reorder_level", "warehouse_reorder_qty"),
+	),
+)
+
+
+def ensure_indexes():
+	"""
+	Create the app indexes that are missing and rebuild the ones whose columns changed
+	Returns: list of (doctype, index name) that could not be verified afterwards
+	"""
+	for doctype, index_name, columns in APP_INDEXES:
+		existing = get_index_columns(doctype, index_name)
+		if existing == columns:
+			continue
+		if existing:
+			frappe.db.sql_ddl(f"ALTER TABLE `tab{doctype}` DROP INDEX `{index_name}`")
+		frappe.db.add_index(doctype, list(columns), index_name)
+
+	return verify_indexes()
+
+
+def verify_indexes():
+	"""
+	Returns: list of (doctype, index name) that are missing or do not match APP_INDEXES
+	"""
+	return [
+		(doctype, index_name)
+		for doctype, index_name, columns in APP_INDEXES
+		if get_index_columns(doctype, index_name) != columns
+	]
+
+
+def get_index_columns(doctype, index_name):
+	"""
+	Returns: tuple of the index columns in order, empty if the index does not exist
+	"""
+	rows = frappe.db.sql(
+		f"""
+		SHOW INDEX FROM `tab{doctype}` WHERE Key_name = %(index_name)s
+		""",
+		{"index_name": index_name},
+		as_dict=True,
+	)
+	return tuple(row.Column_name for row in sorted(rows, key=lambda row: row.Seq_in_index))
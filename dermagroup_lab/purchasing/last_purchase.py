@@ -0,0 +1,324 @@
+import hashlib
+
+import frappe
+from frappe.utils import get_datetime, now
+
+from dermagroup_lab.instrumentation import instrument_hook
+
+# Source doctypes in lookup order, with the field that decides which purchase is the latest
+LAST_PURCHASE_SOURCES = (("Purchase Receipt", "creation"), ("Purchase Order", "schedule_date"))
+INDEX_BUILT_KEY = "dermagroup_lab_last_purchase_index_built"
+INDEX_FIELDS = (
+	"item_code",
+	"warehouse",
+	"source_doctype",
+	"source_name",
+	"supplier",
+	"qty",
+	"rate",
+	"sort_key",
+)
+
+
+def get_index_key(source_doctype, item_code, warehouse=None):
+	"""
+	Primary key of the Item Last Purchase row for a source doctype, item and warehouse.
+	An empty warehouse stands for the latest purchase of the item in any warehouse.
+	"""
+	raw = "\x1f".join((source_doctype, item_code, warehouse or ""))
+	return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def is_index_built():
+	return frappe.db.get_global(INDEX_BUILT_KEY) == "1"
+
+
+def get_last_purchase_map(pairs):
+	"""
+	Resolve the last purchase for many (item_code, warehouse) pairs, Purchase Receipts first
+	and Purchase Orders as fallback, with one lookup per source doctype.
+	A pair without warehouse matches the latest purchase of the item in any warehouse.
+	Returns: dict of (item_code, warehouse) -> dict with purchase_order, supplier, qty, rate
+	"""
+	pending = {(item_code, warehouse or None) for item_code, warehouse in pairs if item_code}
+	details = {}
+
+	for source_doctype, _sort_field in LAST_PURCHASE_SOURCES:
+		if not pending:
+			break
+
+		latest = get_latest_purchases(source_doctype, pending)
+		for pair in list(pending):
+			purchase = latest.get(pair)
+			if purchase:
+				details[pair] = {
+					"purchase_order": purchase.parent,
+					"supplier": purchase.supplier,
+					"qty": purchase.qty,
+					"rate": purchase.rate,
+				}
+				pending.discard(pair)
+
+	# Callers may pass "" for a missing warehouse
+	for item_code, warehouse in pairs:
+		if item_code and not warehouse and (item_code, None) in details:
+			details[(item_code, warehouse)] = details[(item_code, None)]
+
+	return details
+
+
+def get_latest_purchases(source_doctype, pairs):
+	"""
+	Latest submitted purchase of a source doctype for the given (item_code, warehouse) pairs.
+	Reads the Item Last Purchase index by primary key once it has been built, and falls back
+	to scanning purchase history otherwise.
+	Returns: dict of (item_code, warehouse or None) -> row with parent, supplier, qty, rate, sort_key
+	"""
+	pairs = {(item_code, warehouse or None) for item_code, warehouse in pairs if item_code}
+	if not pairs:
+		return {}
+
+	if not is_index_built():
+		return get_latest_purchases_from_history(source_doctype, {item_code for item_code, _wh in pairs})
+
+	rows = frappe.get_all(
+		"Item Last Purchase",
+		filters={
+			"name": [
+				"in",
+				[get_index_key(source_doctype, item_code, warehouse) for item_code, warehouse in pairs],
+			]
+		},
+		fields=["item_code", "warehouse", "source_name as parent", "supplier", "qty", "rate", "sort_key"],
+	)
+	return {(row.item_code, row.warehouse or None): row for row in rows}
+
+
+def get_latest_purchases_from_history(source_doctype, item_codes):
+	"""
+	Latest submitted purchase per (item_code, warehouse) and per item, scanned from history
+	Returns: dict of (item_code, warehouse or None) -> row with parent, supplier, qty, rate, sort_key
+	"""
+	if not item_codes:
+		return {}
+
+	sort_field = dict(LAST_PURCHASE_SOURCES)[source_doctype]
+	rows = frappe.db.sql(
+		f"""
+		SELECT
+			item_code, warehouse, parent, supplier, qty, rate, sort_key
+		FROM (
+			SELECT
+				pi.item_code,
+				pi.warehouse,
+				pi.parent,
+				p.supplier,
+				pi.qty,
+				pi.rate,
+				pi.`{sort_field}` AS sort_key,
+				ROW_NUMBER() OVER (
+					PARTITION BY pi.item_code, pi.warehouse
+					ORDER BY pi.`{sort_field}` DESC
+				) AS row_num
+			FROM
+				`tab{source_doctype} Item` pi
+			INNER JOIN
+				`tab{source_doctype}` p ON p.name = pi.parent
+			WHERE
+				pi.docstatus = 1
+				AND pi.item_code IN %(item_codes)s
+		) latest
+		WHERE
+			row_num = 1
+		""",
+		{"item_codes": tuple(item_codes)},
+		as_dict=True,
+	)
+
+	latest = {}
+	for row in rows:
+		latest[(row.item_code, row.warehouse or None)] = row
+		current = latest.get((row.item_code, None))
+		if not current or get_datetime(row.sort_key) > get_datetime(current.sort_key):
+			latest[(row.item_code, None)] = row
+
+	return latest
+
+
+@instrument_hook
+def update_last_purchase_index(doc, method=None):
+	"""
+	Hook for Purchase Receipt/Purchase Order on_submit - record the purchase when it is newer
+	than the indexed one
+	"""
+	sort_field = dict(LAST_PURCHASE_SOURCES).get(doc.doctype)
+	if not sort_field:
+		return
+
+	entries = {}
+	for row in doc.get("items") or []:
+		if not row.item_code:
+			continue
+
+		values = {
+			"item_code": row.item_code,
+			"source_doctype": doc.doctype,
+			"source_name": doc.name,
+			"supplier": doc.get("supplier"),
+			"qty": row.qty,
+			"rate": row.rate,
+			"sort_key": get_datetime(row.get(sort_field)),
+		}
+		for warehouse in {row.warehouse or None, None}:
+			key = get_index_key(doc.doctype, row.item_code, warehouse)
+			if key not in entries or values["sort_key"] >= entries[key]["sort_key"]:
+				entries[key] = {**values, "warehouse": warehouse}
+
+	if not entries:
+		return
+
+	indexed = dict(
+		frappe.get_all(
+			"Item Last Purchase",
+			filters={"name": ["in", list(entries)]},
+			fields=["name", "sort_key"],
+			as_list=True,
+		)
+	)
+	_write_index_entries(
+		{
+			key: values
+			for key, values in entries.items()
+			if not indexed.get(key) or values["sort_key"] >= get_datetime(indexed[key])
+		}
+	)
+
+
+@instrument_hook
+def revert_last_purchase_index(doc, method=None):
+	"""
+	Hook for Purchase Receipt/Purchase Order on_cancel - replace the entries that pointed to
+	the cancelled document with the previous purchase from history
+	"""
+	if doc.doctype not in dict(LAST_PURCHASE_SOURCES):
+		return
+
+	affected = set(
+		frappe.get_all(
+			"Item Last Purchase",
+			filters={"source_doctype": doc.doctype, "source_name": doc.name},
+			pluck="name",
+		)
+	)
+	if not affected:
+		return
+
+	frappe.db.delete("Item Last Purchase", {"name": ["in", list(affected)]})
+
+	item_codes = {row.item_code for row in doc.get("items") or [] if row.item_code}
+	entries = {}
+	for (item_code, warehouse), row in get_latest_purchases_from_history(doc.doctype, item_codes).items():
+		key = get_index_key(doc.doctype, item_code, warehouse)
+		if key in affected:
+			entries[key] = _history_row_to_entry(doc.doctype, row, warehouse)
+
+	_write_index_entries(entries)
+
+
+def rebuild_last_purchase_index(chunk_size=5000):
+	"""
+	Rebuild the Item Last Purchase index from purchase history, streaming each source doctype
+	in keyset-paginated chunks so memory stays bounded by the chunk size
+	"""
+	frappe.db.set_global(INDEX_BUILT_KEY, "0")
+	frappe.db.delete("Item Last Purchase")
+	frappe.db.commit()
+
+	for source_doctype, sort_field in LAST_PURCHASE_SOURCES:
+		for chunk in _iter_purchase_history(source_doctype, sort_field, chunk_size):
+			# History is streamed oldest first, so later rows replace earlier ones
+			entries = {}
+			for row in chunk:
+				for warehouse in (row.warehouse or None, None):
+					entries[get_index_key(source_doctype, row.item_code, warehouse)] = _history_row_to_entry(
+						source_doctype, row, warehouse
+					)
+
+			_write_index_entries(entries)
+			frappe.db.commit()
+
+	frappe.db.set_global(INDEX_BUILT_KEY, "1")
+	frappe.db.commit()
+
+
+def _iter_purchase_history(source_doctype, sort_field, chunk_size):
+	last_sort_key, last_name = None, None
+
+	while True:
+		condition = ""
+		if last_name is not None:
+			condition = f"AND (pi.`{sort_field}`, pi.name) > (%(last_sort_key)s, %(last_name)s)"
+
+		chunk = frappe.db.sql(
+			f"""
+			SELECT
+				pi.name,
+				pi.item_code,
+				pi.warehouse,
+				pi.parent,
+				p.supplier,
+				pi.qty,
+				pi.rate,
+				pi.`{sort_field}` AS sort_key
+			FROM
+				`tab{source_doctype} Item` pi
+			INNER JOIN
+				`tab{source_doctype}` p ON p.name = pi.parent
+			WHERE
+				pi.docstatus = 1
+				{condition}
+			ORDER BY
+				pi.`{sort_field}`, pi.name
+			LIMIT %(chunk_size)s
+			""",
+			{"last_sort_key": last_sort_key, "last_name": last_name, "chunk_size": chunk_size},
+			as_dict=True,
+		)
+		if not chunk:
+			return
+
+		yield chunk
+
+		last_sort_key, last_name = chunk[-1].sort_key, chunk[-1].name
+		if len(chunk) < chunk_size:
+			return
+
+
+def _history_row_to_entry(source_doctype, row, warehouse):
+	return {
+		"item_code": row.item_code,
+		"warehouse": warehouse,
+		"source_doctype": source_doctype,
+		"source_name": row.parent,
+		"supplier": row.supplier,
+		"qty": row.qty,
+		"rate": row.rate,
+		"sort_key": get_datetime(row.sort_key),
+	}
+
+
+def _write_index_entries(entries):
+	if not entries:
+		return
+
+	frappe.db.delete("Item Last Purchase", {"name": ["in", list(entries)]})
+
+	timestamp = now()
+	frappe.db.bulk_insert(
+		"Item Last Purchase",
+		fields=["name", "creation", "modified", "owner", "modified_by", *INDEX_FIELDS],
+		values=[
+			(key, timestamp, timestamp, "Administrator", "Administrator", *(values[f] for f in INDEX_FIELDS))
+			for key, values in entries.items()
+		],
+	)
@@ -0,0 +1,144 @@
+import hashlib
+import math
+
+import frappe
+from frappe.utils import add_days, flt, now, nowdate
+
+HISTORY_DAYS = 730
+LEAD_TIME_FIELDS = ("supplier", "item_code", "purchase_type", "median_days", "p90_days", "sample_size")
+
+
+def get_lead_time_key(supplier, item_code, purchase_type=None):
+	"""
+	Primary key of the Supplier Lead Time row of a supplier, item and purchase type.
+	An empty purchase type stands for the purchases of every type.
+	"""
+	raw = "\x1f".join((supplier, item_code, purchase_type or ""))
+	return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def get_supplier_lead_time_map(keys):
+	"""
+	Lead time statistics for many (supplier, item_code, purchase_type) keys with one primary key
+	lookup, falling back to the statistics over every purchase type of the supplier and item
+	Returns: dict of key -> dict with median_days, p90_days, sample_size, only for keys with history
+	"""
+	keys = {key for key in keys if key[0] and key[1]}
+	names = {}
+	for supplier, item_code, purchase_type in keys:
+		names[get_lead_time_key(supplier, item_code, purchase_type)] = None
+		names[get_lead_time_key(supplier, item_code)] = None
+	if not names:
+		return {}
+
+	rows = {
+		row.name: row
+		for row in frappe.db.sql(
+			"""
+			SELECT
+				name, median_days, p90_days, sample_size
+			FROM
+				`tabSupplier Lead Time`
+			WHERE
+				name IN %(names)s
+			""",
+			{"names": tuple(names)},
+			as_dict=True,
+		)
+	}
+
+	lead_times = {}
+	for supplier, item_code, purchase_type in keys:
+		row = rows.get(get_lead_time_key(supplier, item_code, purchase_type)) or rows.get(
+			get_lead_time_key(supplier, item_code)
+		)
+		if row:
+			lead_times[(supplier, item_code, purchase_type)] = {
+				"median_days": math.ceil(flt(row.median_days)),
+				"p90_days": math.ceil(flt(row.p90_days)),
+				"sample_size": row.sample_size,
+			}
+
+	return lead_times
+
+
+def rebuild_supplier_lead_times(history_days=HISTORY_DAYS):
+	"""
+	Compute the median and 90th percentile of the days from Purchase Order to
+	Purchase Receipt per supplier, item and Material Request purchase type, plus per supplier and
+	item over every type. Percentiles are computed by MariaDB window functions in one pass over
+	the receipt history, and the table is replaced in a single transaction.
+	"""
+	cutoff_date = add_days(nowdate(), -int(history_days))
+	rows = frappe.db.sql(
+		"""
+		WITH receipts AS (
+			SELECT
+				po.supplier,
+				pri.item_code,
+				mr.purchase_type,
+				DATEDIFF(pr.posting_date, po.transaction_date) AS lead_days
+			FROM
+				`tabPurchase Receipt Item` pri
+			INNER JOIN
+				`tabPurchase Receipt` pr ON pr.name = pri.parent
+			INNER JOIN
+				`tabPurchase Order` po ON po.name = pri.purchase_order
+			LEFT JOIN
+				`tabMaterial Request` mr ON mr.name = pri.material_request
+			WHERE
+				pr.docstatus = 1
+				AND po.docstatus = 1
+				AND pr.posting_date >= %(cutoff_date)s
+				AND pr.posting_date >= po.transaction_date
+		)
+		SELECT DISTINCT
+			supplier,
+			item_code,
+			purchase_type,
+			PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY lead_days)
+				OVER (PARTITION BY supplier, item_code, purchase_type) AS median_days,
+			PERCENTILE_CONT(0.9) WITHIN GROUP (ORDER BY lead_days)
+				OVER (PARTITION BY supplier, item_code, purchase_type) AS p90_days,
+			COUNT(*) OVER (PARTITION BY supplier, item_code, purchase_type) AS sample_size
+		FROM
+			receipts
+		WHERE
+			IFNULL(purchase_type, '') != ''
+
+		UNION ALL
+
+		SELECT DISTINCT
+			supplier,
+			item_code,
+			'' AS purchase_type,
+			PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY lead_days)
+				OVER (PARTITION BY supplier, item_code) AS median_days,
+			PERCENTILE_CONT(0.9) WITHIN GROUP (ORDER BY lead_days)
+				OVER (PARTITION BY supplier, item_code) AS p90_days,
+			COUNT(*) OVER (PARTITION BY supplier, item_code) AS sample_size
+		FROM
+			receipts
+		""",
+		{"cutoff_date": cutoff_date},
+		as_dict=True,
+	)
+
+	frappe.db.delete("Supplier Lead Time")
+	timestamp = now()
+	frappe.db.bulk_insert(
+		"Supplier Lead Time",
+		fields=["name", "creation", "modified", "owner", "modified_by", *LEAD_TIME_FIELDS],
+		values=[
+			(
+				get_lead_time_key(row.supplier, row.item_code, row.purchase_type),
+				timestamp,
+				timestamp,
+				"Administrator",
+				"Administrator",
+				*(row[field] for field in LEAD_TIME_FIELDS),
+			)
+			for row in rows
+		],
+	)
+	frappe.db.commit()
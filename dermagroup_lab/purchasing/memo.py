@@ -0,0 +1,113 @@
+from collections import OrderedDict
+
+import frappe
+
+from dermagroup_lab.instrumentation import instrument_hook
+
+MEMO_MAX_SIZE = 1024
+_MISSING = object()
+
+
+class RequestMemo:
+	"""
+	Bounded least-recently-used memo of master data lookups, one per request or background job
+	since it lives on frappe.local. Every namespace keeps its own hit and miss counters.
+	"""
+
+	def __init__(self, max_size=MEMO_MAX_SIZE):
+		self.max_size = max_size
+		self.namespaces = {}
+		self.stats = {}
+
+	def get(self, namespace, key, loader):
+		values = self.namespaces.setdefault(namespace, OrderedDict())
+		stats = self.stats.setdefault(namespace, {"hits": 0, "misses": 0})
+
+		value = values.get(key, _MISSING)
+		if value is not _MISSING:
+			stats["hits"] += 1
+			values.move_to_end(key)
+			return value
+
+		stats["misses"] += 1
+		value = values[key] = loader()
+		if len(values) > self.max_size:
+			values.popitem(last=False)
+		return value
+
+	def clear(self, namespace=None):
+		if namespace is None:
+			self.namespaces.clear()
+		else:
+			self.namespaces.pop(namespace, None)
+
+
+def get_memo():
+	memo = getattr(frappe.local, "dermagroup_lab_memo", None)
+	if memo is None:
+		memo = frappe.local.dermagroup_lab_memo = RequestMemo()
+	return memo
+
+
+def memoize(namespace, key, loader):
+	"""
+	Value of loader() for the key, loaded at most once per request or job while it stays in the memo
+	"""
+	return get_memo().get(namespace, key, loader)
+
+
+def clear_memo(namespace=None):
+	get_memo().clear(namespace)
+
+
+def get_memo_stats():
+	"""
+	Returns: dict of namespace -> dict with hits, misses and size
+	"""
+	memo = get_memo()
+	return {
+		namespace: {**stats, "size": len(memo.namespaces.get(namespace, ()))}
+		for namespace, stats in memo.stats.items()
+	}
+
+
+def get_warehouse_company(warehouse):
+	return memoize(
+		"warehouse_company", warehouse, lambda: frappe.db.get_value("Warehouse", warehouse, "company")
+	)
+
+
+def get_default_company():
+	return memoize("default_company", None, lambda: frappe.db.get_value("Company", {}, "name"))
+
+
+def get_item_lead_time(item_code):
+	return memoize(
+		"item_lead_time", item_code, lambda: frappe.db.get_value("Item", item_code, "lead_time_days")
+	)
+
+
+def get_supplier_email(supplier):
+	if not supplier:
+		return None
+	return memoize("supplier_email", supplier, lambda: frappe.db.get_value("Supplier", supplier, "email_id"))
+
+
+# Namespaces derived from each doctype, dropped when a document of it changes
+MEMO_NAMESPACES = {
+	"Warehouse": ("warehouse_company",),
+	"Company": ("default_company",),
+	"Item": ("item_lead_time",),
+	"Supplier": ("supplier_email",),
+	"Property Setter": ("print_format",),
+}
+
+
+@instrument_hook
+def clear_memo_for_doc(doc, method=None):
+	"""
+	Hook for Warehouse, Company, Item, Supplier and Property Setter changes - the change is
+	visible to the rest of the request
+	"""
+	for namespace in MEMO_NAMESPACES.get(doc.doctype, ()):
+		clear_memo(namespace)
@@ -1,49 +1,246 @@
+from contextlib import contextmanager
+from time import perf_counter
+
 import frappe
 from frappe import _
+from frappe.model.document import Document
+from frappe.utils import now_datetime
 
+from dermagroup_lab.instrumentation import instrument_hook
+from dermagroup_lab.purchasing.memo import get_supplier_email, memoize
+from dermagroup_lab.purchasing.rendering import render_template, render_templates
 
-def send_material_request_to_supplier(material_request):
+ROLE_RECIPIENTS_CACHE_KEY = "dermagroup_lab:role_recipients"
+
+
+def get_role_recipients(role):
 	"""
-	Send material request to supplier via email with PDF attachment
+	Enabled email addresses of the users holding a role, cached in the site cache
+	Returns: list of emails
 	"""
-	mr_doc = frappe.get_doc("Material Request", material_request.name)
+	recipients = frappe.cache().hget(ROLE_RECIPIENTS_CACHE_KEY, role)
+	if recipients is None:
+		recipients = sorted(
+			set(
+				frappe.db.sql_list(
+					"""
+					SELECT
+						u.email
+					FROM
+						`tabUser` u
+					INNER JOIN
+						`tabHas Role` hr ON hr.parent = u.name AND hr.parenttype = 'User'
+					WHERE
+						hr.role = %(role)s
+						AND u.enabled = 1
+						AND u.name NOT IN ('Administrator', 'Guest')
+						AND IFNULL(u.email, '') != ''
+					""",
+					{"role": role},
+				)
+			)
+		)
+		frappe.cache().hset(ROLE_RECIPIENTS_CACHE_KEY, role, recipients)
 
-	# Validate supplier email
-	if not mr_doc.get("supplier_email"):
-		frappe.throw(_("Supplier email is required"))
+	return recipients
 
-	# Get print format
-	# print_format = (
-	# 	frappe.db.get_value(
-	# 		"Property Setter", {"doc_type": "Material Request", "property": "default_print_format"}, "value"
-	# 	)
-	# 	or "Standard"
-	# )
 
-	# Prepare email content
-	subject = _("Material Request") + " - " + mr_doc.name
+@instrument_hook
+def clear_role_recipients_cache(doc=None, method=None):
+	"""
+	Hook for User changes - drop every cached role recipient list. Roles are child rows saved
+	with their User, which fire no doc events of their own.
+	"""
+	frappe.cache().delete_value(ROLE_RECIPIENTS_CACHE_KEY)
+
+
+def get_dispatch_key(material_request, status):
+	"""
+	Idempotency key of a supplier dispatch, one per Material Request and status
+	"""
+	return f"{material_request}::{status}"
 
-	message = frappe.render_template(
-		"dermagroup_lab/templates/emails/material_request_to_supplier.html",
-		{"doc": mr_doc, "supplier_name": mr_doc.get("suggested_supplier")},
+
+def enqueue_material_request_to_supplier(material_request):
+	"""
+	Queue the supplier email for a Material Request, at most once per status.
+	Returns: the dispatch key, or None if it was already sent
+	"""
+	return enqueue_material_requests_to_supplier([material_request]).get(material_request.name)
+
+
+def enqueue_material_requests_to_supplier(material_requests):
+	"""
+	Queue supplier emails for many Material Requests, with one job and one email per supplier
+	address, at most once per Material Request and status.
+	Returns: dict of Material Request name -> dispatch key, for the ones queued
+	"""
+	for material_request in material_requests:
+		# The email fetched when the request was saved may predate the supplier's email
+		if not material_request.get("supplier_email"):
+			material_request.supplier_email = get_supplier_email(material_request.get("suggested_supplier"))
+		if not material_request.get("supplier_email"):
+			frappe.throw(_("Supplier email is required for {0}").format(material_request.name))
+
+	by_key = {get_dispatch_key(mr.name, mr.status): mr for mr in material_requests}
+	dispatch_statuses = dict(
+		frappe.get_all(
+			"Supplier Dispatch Log",
+			filters={"name": ["in", list(by_key)]},
+			fields=["name", "dispatch_status"],
+			as_list=True,
+		)
 	)
 
-	if not message:
+	by_supplier_email = {}
+	for dispatch_key, material_request in by_key.items():
+		if dispatch_statuses.get(dispatch_key) == "Sent":
+			continue
+
+		if dispatch_key not in dispatch_statuses:
+			frappe.get_doc(
+				{
+					"doctype": "Supplier Dispatch Log",
+					"material_request": material_request.name,
+					"status": material_request.status,
+					"supplier_email": material_request.get("supplier_email"),
+					"dispatch_status": "Queued",
+					"queued_on": now_datetime(),
+				}
+			).insert(ignore_permissions=True)
+
+		by_supplier_email.setdefault(material_request.get("supplier_email"), []).append(dispatch_key)
+
+	queued = {}
+	for dispatch_keys in by_supplier_email.values():
+		dispatch_keys.sort()
+		frappe.enqueue(
+			"dermagroup_lab.purchasing.notifications.dispatch_material_requests_to_supplier",
+			queue="short",
+			job_id="supplier_dispatch::" + "|".join(dispatch_keys),
+			deduplicate=True,
+			enqueue_after_commit=True,
+			dispatch_keys=dispatch_keys,
+		)
+		queued.update({by_key[dispatch_key].name: dispatch_key for dispatch_key in dispatch_keys})
+
+	return queued
+
+
+def dispatch_material_request_to_supplier(material_request, status):
+	"""
+	Background job - send the supplier email of a single Material Request
+	"""
+	dispatch_material_requests_to_supplier([get_dispatch_key(material_request, status)])
+
+
+def dispatch_material_requests_to_supplier(dispatch_keys):
+	"""
+	Background job - render and send one supplier email for the given dispatches, recording
+	timings and failures in each Supplier Dispatch Log
+	"""
+	logs = [frappe.get_doc("Supplier Dispatch Log", dispatch_key) for dispatch_key in dispatch_keys]
+	logs = [log for log in logs if log.dispatch_status != "Sent"]
+	if not logs:
 		return
 
-	# Send email
+	timings = {}
 	try:
-		frappe.sendmail(
-			recipients=[mr_doc.get("supplier_email")],
-			subject=subject,
-			message=message,
-			reference_doctype="Material Request",
-			reference_name=mr_doc.name,
-			# attachments=[frappe.attach_print("Material Request", mr_doc.name, print_format=print_format)],
+		mr_docs = [frappe.get_doc("Material Request", log.material_request) for log in logs]
+
+		start = perf_counter()
+		email = render_material_requests_for_supplier(mr_docs)
+		timings["render_time"] = perf_counter() - start
+
+		start = perf_counter()
+		frappe.sendmail(**email)
+		timings["send_time"] = perf_counter() - start
+
+		outcome = {"dispatch_status": "Sent", "sent_on": now_datetime(), "error": None}
+	except Exception:
+		frappe.db.rollback()
+		outcome = {"dispatch_status": "Failed", "error": frappe.get_traceback()}
+		frappe.log_error(
+			"Failed to send material request email: " + ", ".join(log.material_request for log in logs)
 		)
+
+	for log in logs:
+		log.update(timings)
+		log.update(outcome)
+		log.attempts = (log.attempts or 0) + 1
+		log.save(ignore_permissions=True)
+
+	frappe.db.commit()
+
+
+def render_material_request_for_supplier(mr_doc):
+	"""
+	Build the supplier email for a Material Request, with its PDF attached
+	Returns: dict of frappe.sendmail arguments
+	"""
+	return render_material_requests_for_supplier([mr_doc])
+
+
+def render_material_requests_for_supplier(mr_docs):
+	"""
+	Build one supplier email for Material Requests sent to the same address, with their PDFs
+	attached
+	Returns: dict of frappe.sendmail arguments
+	"""
+	for mr_doc in mr_docs:
+		if not mr_doc.get("supplier_email"):
+			frappe.throw(_("Supplier email is required"))
+
+	print_format = memoize(
+		"print_format",
+		"Material Request",
+		lambda: (
+			frappe.db.get_value(
+				"Property Setter",
+				{"doc_type": "Material Request", "property": "default_print_format"},
+				"value",
+			)
+			or "Standard"
+		),
+	)
+
+	message = "".join(
+		render_templates(
+			"templates/emails/material_request_to_supplier.html",
+			[{"doc": mr_doc, "supplier_name": mr_doc.get("suggested_supplier")} for mr_doc in mr_docs],
+		)
+	)
+
+	email = {
+		"recipients": [mr_docs[0].get("supplier_email")],
+		"subject": _("Material Request") + " - " + ", ".join(mr_doc.name for mr_doc in mr_docs),
+		"message": message,
+		"attachments": [
+			frappe.attach_print("Material Request", mr_doc.name, print_format=print_format, doc=mr_doc)
+			for mr_doc in mr_docs
+		],
+	}
+	if len(mr_docs) == 1:
+		email.update({"reference_doctype": "Material Request", "reference_name": mr_docs[0].name})
+
+	return email
+
+
+def send_material_request_to_supplier(material_request):
+	"""
+	Send material request to supplier via email with PDF attachment
+	material_request: the Material Request document, or its name
+	"""
+	mr_doc = material_request
+	if not isinstance(mr_doc, Document):
+		mr_doc = frappe.get_doc("Material Request", material_request)
+	email = render_material_request_for_supplier(mr_doc)
+
+	# Send email
+	try:
+		frappe.sendmail(**email)
 	except Exception as e:
 		frappe.log_error(f"Failed to send material request email: {e!s}")
-		# frappe.throw(_("Failed to send material request email"))
 
 	return True
 
@@ -55,21 +252,12 @@ def notify_purchasing_of_material_request(mr_doc):
 	if mr_doc.get("material_request_type") != "Purchase":
 		return
 
-	users = frappe.get_all(
-		"Has Role",
-		filters={"role": "Purchasing Manager", "parenttype": "User"},
-		fields=["parent"],
-	)
-	user_names = [u.parent for u in users if u.parent not in ["Administrator", "Guest"]]
-	if not user_names:
+	# Bulk creation collects the request for a single digest email
+	if frappe.flags.material_request_digest is not None:
+		frappe.flags.material_request_digest.append(mr_doc.name)
 		return
 
-	emails = frappe.get_all(
-		"User",
-		filters={"name": ["in", user_names], "enabled": 1},
-		fields=["email"],
-	)
-	recipients = list({e.email for e in emails if e.email})
+	recipients = get_role_recipients("Purchasing Manager")
 	if not recipients:
 		return
 
@@ -87,3 +275,68 @@ def notify_purchasing_of_material_request(mr_doc):
 	except Exception as e:
 		frappe.log_error("Unable to notify Purchasing Manager", e)
 		# frappe.throw(_("Unable to notify Purchasing Manager"))
+
+
+@contextmanager
+def material_request_digest(send=True):
+	"""
+	Collect the purchasing notifications raised inside the block and send them as one digest
+	email to the Purchasing Managers when it completes. Nested blocks share the outer digest.
+	With send=False the caller takes the collected names and sends the digest itself.
+	"""
+	if frappe.flags.material_request_digest is not None:
+		yield frappe.flags.material_request_digest
+		return
+
+	frappe.flags.material_request_digest = collected = []
+	try:
+		yield collected
+	finally:
+		frappe.flags.material_request_digest = None
+
+	if send:
+		send_material_request_digest(collected)
+
+
+def send_material_request_digest(material_requests):
+	"""
+	Send the Purchasing Managers one email listing every given Material Request
+	"""
+	if not material_requests:
+		return
+
+	recipients = get_role_recipients("Purchasing Manager")
+	if not recipients:
+		return
+
+	mr_docs = frappe.get_all(
+		"Material Request",
+		filters={"name": ["in", list(material_requests)]},
+		fields=["name", "company", "schedule_date"],
+		order_by="name asc",
+	)
+	items = {}
+	for row in frappe.get_all(
+		"Material Request Item",
+		filters={"parent": ["in", list(material_requests)], "parenttype": "Material Request"},
+		fields=["parent", "item_code", "qty", "warehouse"],
+		order_by="idx asc",
+	):
+		items.setdefault(row.parent, []).append(row)
+
+	for mr in mr_docs:
+		mr["items"] = items.get(mr.name, [])
+
+	message = render_template(
+		"templates/emails/material_request_digest.html",
+		{"material_requests": mr_docs},
+	)
+
+	try:
+		frappe.sendmail(
+			recipients=recipients,
+			subject=_("Material Requests ready for review ({0})").format(len(mr_docs)),
+			message=message,
+		)
+	except Exception as e:
+		frappe.log_error("Unable to notify Purchasing Manager", e)
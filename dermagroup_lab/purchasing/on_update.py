@@ -1,26 +1,46 @@
-import frappe
-from frappe import _
-
-from dermagroup_lab.purchasing.enums import ApprovalStatus
+from dermagroup_lab.instrumentation import instrument_hook
 from dermagroup_lab.purchasing.notifications import (
+	enqueue_material_requests_to_supplier,
+	material_request_digest,
 	notify_purchasing_of_material_request,
-	send_material_request_to_supplier,
 )
+from dermagroup_lab.purchasing.state_machine import run_transition_hooks
 
 
+@instrument_hook
 def on_update_material_request(doc, method=None):
 	if doc.doctype != "Material Request":
 		return
 	if doc.get("material_request_type") != "Purchase":
 		return
+	# bulk_update_status runs the side effects once for the whole batch
+	if doc.flags.in_bulk_status_update:
+		return
+
+	doc_before_save = doc.get_doc_before_save()
+	run_transition_hooks([(doc, doc_before_save.status if doc_before_save else None)])
+
+
+@instrument_hook
+def notify_pending_approval(docs):
+	"""
+	Status hook for Pending Approval - notify purchasing, as a digest for batches
+	"""
+	docs = [doc for doc in docs if doc.get("material_request_type") == "Purchase"]
+	if len(docs) == 1:
+		notify_purchasing_of_material_request(docs[0])
+		return
 
-	match doc.status:
-		case ApprovalStatus.PENDING_APPROVAL.value:
+	with material_request_digest():
+		for doc in docs:
 			notify_purchasing_of_material_request(doc)
-		case ApprovalStatus.SENT_TO_SUPPLIER.value:
-			if not doc.get("supplier_email"):
-				frappe.throw(_("Supplier email is required"))
-			else:
-				send_material_request_to_supplier(doc)
-		case _:
-			pass
+
+
+@instrument_hook
+def dispatch_to_supplier(docs):
+	"""
+	Status hook for Sent to Supplier - queue the supplier emails
+	"""
+	docs = [doc for doc in docs if doc.get("material_request_type") == "Purchase"]
+	if docs:
+		enqueue_material_requests_to_supplier(docs)
@@ -0,0 +1,54 @@
+import os
+
+import frappe
+
+# (template, language, template mtime) -> compiled Jinja code, kept for the life of the worker
+_compiled_templates = {}
+
+
+def get_template(template):
+	"""
+	Jinja template of the app, compiled once per worker and language. The compiled code is
+	keyed by the template file mtime, so a deploy that changes the file compiles it again.
+	The template is bound to the request's Jinja environment, so globals such as the session
+	user and the translation function are always current.
+	template: path inside the app, e.g. "templates/emails/material_request_to_supplier.html"
+	"""
+	path = frappe.get_app_path("dermagroup_lab", *template.split("/"))
+	key = (template, frappe.local.lang, os.path.getmtime(path))
+
+	jenv = frappe.get_jenv()
+	code = _compiled_templates.get(key)
+	if code is None:
+		with open(path) as template_file:
+			source = template_file.read()
+
+		code = jenv.compile(source, f"dermagroup_lab/{template}", path)
+		# Drop the versions compiled before the last deploy
+		for stale_key in [k for k in _compiled_templates if k[:2] == key[:2]]:
+			del _compiled_templates[stale_key]
+		_compiled_templates[key] = code
+
+	return jenv.template_class.from_code(jenv, code, jenv.make_globals(None))
+
+
+def render_template(template, context):
+	"""
+	Render an app template with the compiled template cache
+	Returns: rendered string
+	"""
+	return get_template(template).render(context)
+
+
+def render_templates(template, contexts):
+	"""
+	Render the same app template for many contexts in one pass, e.g. every Material Request of a
+	grouped supplier dispatch
+	Returns: list of rendered strings, in the order of contexts
+	"""
+	compiled = get_template(template)
+	return [compiled.render(context) for context in contexts]
+
+
+def clear_compiled_templates():
+	_compiled_templates.clear()
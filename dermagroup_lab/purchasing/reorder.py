@@ -0,0 +1,264 @@
+import json
+
+import frappe
+from frappe.utils import add_days, flt, nowdate
+
+from dermagroup_lab.purchasing.consolidation import (
+	DEFAULT_LEAD_TIME_DAYS,
+	consolidate_shortages,
+	create_consolidated_material_requests,
+)
+from dermagroup_lab.purchasing.memo import get_default_company
+from dermagroup_lab.purchasing.notifications import material_request_digest
+
+DEFAULT_CHUNK_SIZE = 1000
+CHECKPOINT_KEY = "dermagroup_lab_reorder_checkpoint"
+
+
+def get_reorder_rows(shard=None, shard_count=None, pairs=None, after=None, limit=None):
+	"""
+	Load every purchase reorder row together with its Bin projection and warehouse company.
+	With shard/shard_count only the items hashing to that shard are loaded, so every item
+	belongs to exactly one shard. With pairs only those (item_code, warehouse) rows are loaded.
+	With after/limit at most limit rows following the (item_code, warehouse) after are loaded,
+	for keyset pagination.
+	Returns: list of dicts with item_code, warehouse, reorder_level, reorder_qty,
+	lead_time_days, projected_qty, company
+	"""
+	shard_condition = ""
+	if shard_count:
+		shard_condition = "AND MOD(CRC32(ir.parent), %(shard_count)s) = %(shard)s"
+
+	pair_condition = ""
+	if pairs is not None:
+		pairs = tuple({(item_code, warehouse) for item_code, warehouse in pairs})
+		if not pairs:
+			return []
+		pair_condition = "AND (ir.parent, ir.warehouse) IN %(pairs)s"
+
+	keyset_condition = ""
+	if after:
+		keyset_condition = "AND (ir.parent, ir.warehouse) > (%(after_item_code)s, %(after_warehouse)s)"
+	limit_clause = "LIMIT %(limit)s" if limit else ""
+
+	return frappe.db.sql(
+		f"""
+		SELECT
+			ir.parent AS item_code,
+			ir.warehouse AS warehouse,
+			ir.warehouse_reorder_level AS reorder_level,
+			ir.warehouse_reorder_qty AS reorder_qty,
+			i.lead_time_days AS lead_time_days,
+			b.projected_qty AS projected_qty,
+			w.company AS company
+		FROM
+			`tabItem Reorder` ir
+		INNER JOIN
+			`tabItem` i ON i.name = ir.parent
+		LEFT JOIN
+			`tabBin` b ON b.item_code = ir.parent AND b.warehouse = ir.warehouse
+		LEFT JOIN
+			`tabWarehouse` w ON w.name = ir.warehouse
+		WHERE
+			i.disabled = 0
+			AND i.is_stock_item = 1
+			AND ir.material_request_type = 'Purchase'
+			{shard_condition}
+			{pair_condition}
+			{keyset_condition}
+		ORDER BY
+			ir.parent, ir.warehouse
+		{limit_clause}
+		""",
+		{
+			"shard": shard,
+			"shard_count": shard_count,
+			"pairs": pairs,
+			"after_item_code": after[0] if after else None,
+			"after_warehouse": after[1] if after else None,
+			"limit": limit,
+		},
+		as_dict=True,
+	)
+
+
+def get_recently_requested_items(days=3):
+	"""
+	Item codes that already have a Purchase Material Request in the last N days
+	"""
+	cutoff_date = add_days(nowdate(), -int(days))
+	return set(
+		frappe.db.sql_list(
+			"""
+			SELECT DISTINCT
+				mri.item_code
+			FROM
+				`tabMaterial Request` mr
+			INNER JOIN
+				`tabMaterial Request Item` mri ON mri.parent = mr.name
+			WHERE
+				mr.transaction_date >= %(cutoff_date)s
+				AND mr.docstatus < 2
+				AND mr.material_request_type = 'Purchase'
+			""",
+			{"cutoff_date": cutoff_date},
+		)
+	)
+
+
+def plan_reorders(reorder_rows, recently_requested=None, default_company=None):
+	"""
+	Compute the Material Requests needed for the given reorder rows, entirely in memory.
+
+	Mirrors the per-row rules of the daily task: an item is reordered when its projected
+	qty is at or below the reorder level, for the larger of the deficiency and the reorder
+	qty, and only once per run since the first request makes the rest duplicates.
+	Returns: list of dicts with item_code, warehouse, company, qty, lead_time_days
+	"""
+	requested = set(recently_requested or ())
+	plan = []
+
+	for row in reorder_rows:
+		item_code = row.get("item_code")
+		warehouse = row.get("warehouse")
+		if not item_code or not warehouse:
+			continue
+
+		reorder_level = flt(row.get("reorder_level"))
+		reorder_qty = flt(row.get("reorder_qty"))
+		if not (reorder_level or reorder_qty):
+			continue
+
+		projected_qty = flt(row.get("projected_qty"))
+		if projected_qty > reorder_level:
+			continue
+
+		deficiency = reorder_level - projected_qty
+		required_qty = deficiency if deficiency > reorder_qty else reorder_qty
+		if required_qty <= 0:
+			continue
+
+		if item_code in requested:
+			continue
+
+		company = row.get("company") or default_company
+		if not company:
+			continue
+
+		requested.add(item_code)
+		plan.append(
+			{
+				"item_code": item_code,
+				"warehouse": warehouse,
+				"company": company,
+				"qty": required_qty,
+				"lead_time_days": int(row.get("lead_time_days") or DEFAULT_LEAD_TIME_DAYS),
+			}
+		)
+
+	return plan
+
+
+def create_reorder_material_requests(plan):
+	"""
+	Create and submit the planned reorders as consolidated Material Requests, notifying
+	purchasing with a single digest
+	Returns: list of created Material Request names
+	"""
+	with material_request_digest():
+		created = create_consolidated_material_requests(consolidate_shortages(plan))
+
+	return [mr_name for mr_name, _group in created]
+
+
+def run_reorder(
+	days_for_duplicates=3,
+	shard=None,
+	shard_count=None,
+	pairs=None,
+	chunk_size=None,
+	commit=True,
+	run_id=None,
+):
+	"""
+	Set-based reorder run: load, plan in memory, then write only the new requests.
+	A full or sharded run walks the reorder rows in keyset-paginated chunks ordered by
+	(item_code, warehouse), committing each chunk together with a checkpoint, so memory stays
+	bounded by the chunk size and a run that was interrupted resumes after its last chunk.
+	The checkpoint also keeps the requests committed but not yet notified, so a resumed run
+	sends them with its digest. A run retried under the same run_id resumes even if the day
+	changed in between. With commit=False nothing is committed and no checkpoint is kept, for
+	callers that own the transaction.
+	Returns: list of created Material Request names
+	"""
+	recently_requested = get_recently_requested_items(days_for_duplicates)
+	default_company = get_default_company()
+
+	if pairs is not None:
+		plan = plan_reorders(
+			get_reorder_rows(pairs=pairs),
+			recently_requested=recently_requested,
+			default_company=default_company,
+		)
+		return create_reorder_material_requests(plan)
+
+	checkpoint_key = get_checkpoint_key(shard, shard_count)
+	checkpoint = get_checkpoint(checkpoint_key, run_id) if commit else {"after": None, "pending": []}
+	after = checkpoint["after"]
+	chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+
+	created = []
+	with material_request_digest() as collected:
+		collected.extend(checkpoint["pending"])
+		while True:
+			reorder_rows = get_reorder_rows(
+				shard=shard, shard_count=shard_count, after=after, limit=chunk_size
+			)
+			if not reorder_rows:
+				break
+
+			plan = plan_reorders(
+				reorder_rows, recently_requested=recently_requested, default_company=default_company
+			)
+			created.extend(create_reorder_material_requests(plan))
+			# An item split across two chunks is still requested once per run
+			recently_requested.update(row["item_code"] for row in plan)
+
+			after = (reorder_rows[-1].item_code, reorder_rows[-1].warehouse)
+			if commit:
+				set_checkpoint(checkpoint_key, after, pending=collected, run_id=run_id)
+				frappe.db.commit()
+
+			if len(reorder_rows) < chunk_size:
+				break
+
+	if commit:
+		frappe.db.set_global(checkpoint_key, None)
+		frappe.db.commit()
+	return created
+
+
+def get_checkpoint_key(shard=None, shard_count=None):
+	if shard_count:
+		return f"{CHECKPOINT_KEY}::{shard}/{shard_count}"
+	return CHECKPOINT_KEY
+
+
+def get_checkpoint(checkpoint_key, run_id=None):
+	"""
+	Returns: dict with after, the last (item_code, warehouse) committed by a run interrupted
+	today or by run_id, else None, and pending, the Material Requests it committed without
+	notifying them
+	"""
+	checkpoint = json.loads(frappe.db.get_global(checkpoint_key) or "{}")
+	# A checkpoint from an earlier day would skip the items before it for today's run
+	resumable = checkpoint.get("run_date") == nowdate() or (run_id and checkpoint.get("run_id") == run_id)
+	after = checkpoint.get("after") if resumable else None
+	return {"after": tuple(after) if after else None, "pending": checkpoint.get("pending") or []}
+
+
+def set_checkpoint(checkpoint_key, after, pending, run_id=None):
+	frappe.db.set_global(
+		checkpoint_key,
+		json.dumps({"run_date": nowdate(), "run_id": run_id, "after": after, "pending": list(pending)}),
+	)
@@ -0,0 +1,92 @@
+import json
+
+import frappe
+
+from dermagroup_lab.instrumentation import instrument_hook
+from dermagroup_lab.purchasing.reorder import run_reorder
+from dermagroup_lab.purchasing.reorder_shards import (
+	ACTIVE_RUN_KEY,
+	INCREMENTAL_RUN_KEY,
+	INCREMENTAL_RUN_TIMEOUT,
+)
+
+DIRTY_PAIRS_KEY = "dermagroup_lab:reorder_dirty_pairs"
+PROCESSING_PAIRS_KEY = "dermagroup_lab:reorder_dirty_pairs:processing"
+
+
+def mark_pairs_dirty(pairs):
+	"""
+	Queue (item_code, warehouse) pairs for the next incremental reorder evaluation. The queue is
+	a redis set, so a pair touched many times between runs is evaluated once.
+	"""
+	members = {
+		json.dumps([item_code, warehouse]) for item_code, warehouse in pairs if item_code and warehouse
+	}
+	if members:
+		frappe.cache().sadd(DIRTY_PAIRS_KEY, *members)
+
+
+@instrument_hook
+def mark_stock_change(doc, method=None):
+	"""
+	Hook for Stock Ledger Entry on_submit and Bin on_update/on_change - the projected qty of
+	the pair may have dropped below its reorder level
+	"""
+	mark_pairs_dirty([(doc.item_code, doc.warehouse)])
+
+
+def take_dirty_pairs():
+	"""
+	Atomically move the dirty set aside so pairs marked during the evaluation go to the next run
+	Returns: list of (item_code, warehouse)
+	"""
+	cache = frappe.cache()
+	dirty_key, processing_key = cache.make_key(DIRTY_PAIRS_KEY), cache.make_key(PROCESSING_PAIRS_KEY)
+
+	# exists() prefixes the names itself, the raw set commands below take the prefixed keys
+	# A previous run that failed before finishing left its pairs in the processing set
+	if cache.exists(DIRTY_PAIRS_KEY):
+		if cache.exists(PROCESSING_PAIRS_KEY):
+			cache.sunionstore(processing_key, [processing_key, dirty_key])
+			cache.delete(dirty_key)
+		else:
+			cache.rename(dirty_key, processing_key)
+
+	return [tuple(json.loads(member)) for member in cache.smembers(PROCESSING_PAIRS_KEY)]
+
+
+def process_dirty_reorder_pairs(days_for_duplicates=3):
+	"""
+	Scheduled job - evaluate only the pairs whose stock changed since the last run with the
+	same planning rules as the daily sweep, which remains as the reconciliation pass
+	Returns: list of created Material Request names
+	"""
+	cache = frappe.cache()
+	run_id = frappe.generate_hash(length=10)
+	if not cache.set(cache.make_key(INCREMENTAL_RUN_KEY), run_id, nx=True, ex=INCREMENTAL_RUN_TIMEOUT):
+		# The previous interval is still evaluating
+		return []
+
+	try:
+		# The lock is taken before checking the daily one, so a daily run starting now either
+		# is seen here or waits for this run to release its lock
+		if cache.get(cache.make_key(ACTIVE_RUN_KEY)):
+			# The daily sweep evaluates every pair, the queued ones wait for the next interval
+			return []
+
+		pairs = take_dirty_pairs()
+		if not pairs:
+			return []
+
+		created = run_reorder(days_for_duplicates=days_for_duplicates, pairs=pairs)
+		frappe.db.commit()
+		cache.delete(cache.make_key(PROCESSING_PAIRS_KEY))
+		return created
+	except Exception:
+		frappe.db.rollback()
+		frappe.log_error("Incremental reorder evaluation failed")
+		return []
+	finally:
+		# A run that outlived its lock must not release the lock of the next interval
+		if cache.get(cache.make_key(INCREMENTAL_RUN_KEY)) in (run_id, run_id.encode()):
+			cache.delete(cache.make_key(INCREMENTAL_RUN_KEY))
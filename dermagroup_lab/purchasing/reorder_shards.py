@@ -0,0 +1,261 @@
+import time
+
+import frappe
+from frappe.utils.background_jobs import is_job_enqueued
+
+from dermagroup_lab.purchasing.memo import get_memo_stats
+from dermagroup_lab.purchasing.notifications import material_request_digest, send_material_request_digest
+from dermagroup_lab.purchasing.reorder import get_checkpoint, get_checkpoint_key, run_reorder, set_checkpoint
+
+DEFAULT_SHARD_COUNT = 8
+RUN_TIMEOUT = 6 * 60 * 60
+ACTIVE_RUN_KEY = "dermagroup_lab:reorder_run:active"
+INCREMENTAL_RUN_KEY = "dermagroup_lab:reorder_run:incremental"
+INCREMENTAL_RUN_TIMEOUT = 30 * 60
+# Attempts per shard, the first run included, before it is reported as failed
+MAX_SHARD_ATTEMPTS = 3
+
+
+def get_shard_job_id(run_id, shard, attempt=0):
+	if attempt:
+		return f"reorder_shard::{run_id}::{shard}::{attempt}"
+	return f"reorder_shard::{run_id}::{shard}"
+
+
+def enqueue_executor(method, **kwargs):
+	"""
+	Run a shard as a background job on the long queue
+	"""
+	frappe.enqueue(
+		f"{method.__module__}.{method.__name__}",
+		queue="long",
+		timeout=RUN_TIMEOUT,
+		job_id=get_shard_job_id(kwargs["run_id"], kwargs["shard"], kwargs.get("attempt", 0)),
+		deduplicate=True,
+		enqueue_after_commit=True,
+		**kwargs,
+	)
+
+
+def inline_executor(method, **kwargs):
+	"""
+	Run a shard in the current process, used by tests and bench execute
+	"""
+	method(**kwargs)
+
+
+def get_shard_count():
+	return int(frappe.conf.get("dermagroup_lab_reorder_shards") or DEFAULT_SHARD_COUNT)
+
+
+def run_sharded_reorder(days_for_duplicates=3, shard_count=None, executor=None):
+	"""
+	Coordinator for the daily reorder run: split the items into hash shards and hand each one
+	to the executor. Shards are disjoint by item code, and duplicate detection is per item, so
+	no two shards can request the same item.
+	Returns: the run id, or None if a run is already in progress
+	"""
+	shard_count = shard_count or get_shard_count()
+	executor = executor or enqueue_executor
+	run_id = frappe.generate_hash(length=10)
+
+	cache = frappe.cache()
+	# A run whose shard jobs died without reporting still holds the lock
+	finalize_stale_reorder_run()
+	if not cache.set(cache.make_key(ACTIVE_RUN_KEY), run_id, nx=True, ex=RUN_TIMEOUT):
+		frappe.logger("dermagroup_lab").info("Reorder run skipped, another run is in progress")
+		return None
+
+	cache.set(cache.make_key(f"{_get_results_key(run_id)}:shard_count"), shard_count, ex=RUN_TIMEOUT)
+	# Kept for the shards the watchdog retries
+	cache.set(
+		cache.make_key(f"{_get_results_key(run_id)}:days_for_duplicates"), days_for_duplicates, ex=RUN_TIMEOUT
+	)
+	for shard in range(shard_count):
+		executor(
+			run_reorder_shard,
+			run_id=run_id,
+			shard=shard,
+			shard_count=shard_count,
+			days_for_duplicates=days_for_duplicates,
+		)
+
+	return run_id
+
+
+def wait_for_incremental_run(poll_interval=5):
+	"""
+	Block while an incremental evaluation holds its lock, which expires after
+	INCREMENTAL_RUN_TIMEOUT at the latest
+	"""
+	cache = frappe.cache()
+	while cache.get(cache.make_key(INCREMENTAL_RUN_KEY)):
+		time.sleep(poll_interval)
+
+
+def run_reorder_shard(run_id, shard, shard_count, days_for_duplicates=3, attempt=0):
+	"""
+	Background job - run the reorder engine for one shard and commit it independently.
+	A shard that fails is retried up to MAX_SHARD_ATTEMPTS, resuming after its last committed
+	chunk. The shard that completes last aggregates the run.
+	"""
+	# The daily lock stops new incremental runs, one already evaluating pairs finishes first.
+	# Waiting here keeps the scheduler free, and is short since a run only evaluates its pairs.
+	wait_for_incremental_run()
+
+	result = {"created": [], "notify": [], "error": None}
+	try:
+		with material_request_digest(send=False) as collected:
+			result["created"] = run_reorder(
+				days_for_duplicates=days_for_duplicates, shard=shard, shard_count=shard_count, run_id=run_id
+			)
+		result["notify"] = collected
+		frappe.db.commit()
+		frappe.logger("dermagroup_lab").info(
+			f"Reorder shard {shard}/{shard_count} lookups: {get_memo_stats()}"
+		)
+	except Exception:
+		frappe.db.rollback()
+		result["error"] = frappe.get_traceback()
+		frappe.log_error(f"Reorder shard {shard}/{shard_count} failed")
+		if attempt + 1 < MAX_SHARD_ATTEMPTS:
+			# The retry picks up the pending notifications together with the checkpoint
+			retry_reorder_shard(run_id, shard, shard_count, attempt + 1, days_for_duplicates)
+			frappe.db.commit()
+			return
+
+		# The chunks committed before the failure are notified with the run
+		result["notify"] = take_pending_notifications(shard, shard_count, run_id)
+		frappe.db.commit()
+
+	cache = frappe.cache()
+	cache.hset(_get_results_key(run_id), str(shard), result)
+	completed = cache.incr(cache.make_key(f"{_get_results_key(run_id)}:completed"))
+	cache.expire(cache.make_key(f"{_get_results_key(run_id)}:completed"), RUN_TIMEOUT)
+
+	if completed == shard_count:
+		finalize_reorder_run(run_id, shard_count=shard_count)
+
+
+def retry_reorder_shard(run_id, shard, shard_count, attempt, days_for_duplicates=3, executor=None):
+	"""
+	Hand a failed or dead shard to the executor again under the same run, so it resumes from
+	its checkpoint. The attempt is recorded first, the watchdog looks for its job from then on.
+	"""
+	frappe.cache().hset(_get_attempts_key(run_id), str(shard), attempt)
+	(executor or enqueue_executor)(
+		run_reorder_shard,
+		run_id=run_id,
+		shard=shard,
+		shard_count=shard_count,
+		days_for_duplicates=days_for_duplicates,
+		attempt=attempt,
+	)
+
+
+def take_pending_notifications(shard, shard_count, run_id=None):
+	"""
+	Requests committed by a shard that failed or died before reporting, removed from its
+	checkpoint so they are notified exactly once
+	Returns: list of Material Request names
+	"""
+	checkpoint_key = get_checkpoint_key(shard, shard_count)
+	checkpoint = get_checkpoint(checkpoint_key, run_id)
+	if checkpoint["pending"]:
+		set_checkpoint(checkpoint_key, checkpoint["after"], pending=[], run_id=run_id)
+	return checkpoint["pending"]
+
+
+def finalize_stale_reorder_run(executor=None):
+	"""
+	Watchdog for a run whose shard jobs were killed or timed out: nothing runs after such a
+	shard, so a shard that neither reported nor has a job left is retried from its checkpoint.
+	The run is finalized here once every shard has reported or used up its attempts, and the
+	missing shards are reported as failed.
+	Returns: the finalize summary, or None if there is no stale run
+	"""
+	cache = frappe.cache()
+	run_id = cache.get(cache.make_key(ACTIVE_RUN_KEY))
+	if not run_id:
+		return None
+
+	run_id = frappe.safe_decode(run_id)
+	shard_count = cache.get(cache.make_key(f"{_get_results_key(run_id)}:shard_count"))
+	if not shard_count:
+		# Not a sharded run, or one whose bookkeeping already expired
+		return None
+
+	shard_count = int(shard_count)
+	days_for_duplicates = cache.get(cache.make_key(f"{_get_results_key(run_id)}:days_for_duplicates"))
+	reported = {int(shard) for shard in cache.hkeys(_get_results_key(run_id))}
+	attempts = cache.hgetall(_get_attempts_key(run_id)) or {}
+
+	running = False
+	for shard in range(shard_count):
+		if shard in reported:
+			continue
+
+		attempt = int(attempts.get(str(shard)) or 0)
+		if is_job_enqueued(get_shard_job_id(run_id, shard, attempt)):
+			running = True
+		elif attempt + 1 < MAX_SHARD_ATTEMPTS:
+			retry_reorder_shard(
+				run_id, shard, shard_count, attempt + 1, int(days_for_duplicates or 3), executor=executor
+			)
+			running = True
+
+	if running:
+		return None
+
+	return finalize_reorder_run(run_id, shard_count=shard_count)
+
+
+def finalize_reorder_run(run_id, shard_count=None):
+	"""
+	Aggregate the shard results, send a single purchasing digest and release the run.
+	Runs once per run, whether reached by the last shard or by the watchdog.
+	Returns: dict with created, failed_shards, or None if the run was already finalized
+	"""
+	cache = frappe.cache()
+	if not cache.set(cache.make_key(f"{_get_results_key(run_id)}:finalized"), 1, nx=True, ex=RUN_TIMEOUT):
+		return None
+
+	results = cache.hgetall(_get_results_key(run_id)) or {}
+
+	created, notify, failed_shards = [], [], []
+	for shard, result in sorted(results.items(), key=lambda entry: int(entry[0])):
+		created.extend(result["created"])
+		notify.extend(result["notify"])
+		if result["error"]:
+			failed_shards.append(int(shard))
+
+	if shard_count:
+		missing = set(range(shard_count)) - {int(shard) for shard in results}
+		for shard in missing:
+			notify.extend(take_pending_notifications(shard, shard_count, run_id))
+		failed_shards = sorted({*failed_shards, *missing})
+
+	send_material_request_digest(notify)
+	frappe.db.commit()
+
+	cache.delete_value(_get_results_key(run_id))
+	cache.delete_value(_get_attempts_key(run_id))
+	cache.delete(cache.make_key(f"{_get_results_key(run_id)}:days_for_duplicates"))
+	cache.delete(cache.make_key(f"{_get_results_key(run_id)}:completed"))
+	cache.delete(cache.make_key(f"{_get_results_key(run_id)}:shard_count"))
+	if cache.get(cache.make_key(ACTIVE_RUN_KEY)) in (run_id, run_id.encode()):
+		cache.delete(cache.make_key(ACTIVE_RUN_KEY))
+
+	summary = {"run_id": run_id, "created": created, "failed_shards": failed_shards}
+	frappe.logger("dermagroup_lab").info(
+		f"Reorder run {run_id}: {len(created)} Material Requests created, failed shards: {failed_shards}"
+	)
+	return summary
+
+
+def _get_results_key(run_id):
+	return f"dermagroup_lab:reorder_run:{run_id}"
+
+
+def _get_attempts_key(run_id):
+	return f"dermagroup_lab:reorder_run:{run_id}:attempts"
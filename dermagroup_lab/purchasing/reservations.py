@@ -0,0 +1,117 @@
+import hashlib
+
+import frappe
+from frappe.utils import getdate, now, nowdate
+
+from dermagroup_lab.instrumentation import instrument_hook
+
+
+def get_reservation_key(item_code, warehouse, reservation_date, supplier=None):
+	"""
+	Primary key of the Material Request Reservation of an item and warehouse on a date, per
+	suggested supplier like the duplicate check. An empty supplier stands for requests without one.
+	"""
+	raw = "\x1f".join((item_code, warehouse, str(getdate(reservation_date)), supplier or ""))
+	return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def claim_reservations(pairs, reservation_date=None, supplier=None):
+	"""
+	Reserve (item_code, warehouse) pairs for a new Material Request on a date, for the suggested
+	supplier of the request. The reservation
+	primary key makes the claim race-free: while another transaction holds an uncommitted claim
+	on a pair, the insert waits for it, and the pair is only claimed here if that transaction
+	rolls back. Pairs reserved by earlier requests are never claimed.
+	Returns: set of the pairs claimed by this call
+	"""
+	reservation_date = getdate(reservation_date or nowdate())
+	keys = {
+		get_reservation_key(item_code, warehouse, reservation_date, supplier): (item_code, warehouse)
+		for item_code, warehouse in pairs
+		if item_code and warehouse
+	}
+	if not keys:
+		return set()
+
+	claim_token = frappe.generate_hash(length=20)
+	timestamp = now()
+	# Sorted so concurrent claims on overlapping pairs lock rows in the same order
+	rows = [
+		(
+			key,
+			timestamp,
+			timestamp,
+			frappe.session.user,
+			frappe.session.user,
+			*keys[key],
+			supplier or "",
+			reservation_date,
+			claim_token,
+		)
+		for key in sorted(keys)
+	]
+	frappe.db.sql(
+		f"""
+		INSERT IGNORE INTO `tabMaterial Request Reservation`
+			(name, creation, modified, owner, modified_by, item_code, warehouse, supplier, reservation_date,
+			claim_token)
+		VALUES
+			{", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"] * len(rows))}
+		""",
+		[value for row in rows for value in row],
+	)
+
+	claimed = frappe.db.sql_list(
+		"""
+		SELECT name FROM `tabMaterial Request Reservation`
+		WHERE name IN %(keys)s AND claim_token = %(claim_token)s
+		""",
+		{"keys": tuple(keys), "claim_token": claim_token},
+	)
+	return {keys[key] for key in claimed}
+
+
+def get_material_request_pairs(doc):
+	return {
+		(row.item_code, row.warehouse) for row in doc.get("items") or [] if row.item_code and row.warehouse
+	}
+
+
+@instrument_hook
+def link_reservations(doc, method=None):
+	"""
+	Hook for Material Request after_insert - record which request holds the reservations claimed
+	for its items
+	"""
+	keys = [
+		get_reservation_key(
+			item_code, warehouse, doc.transaction_date or nowdate(), doc.get("suggested_supplier")
+		)
+		for item_code, warehouse in get_material_request_pairs(doc)
+	]
+	if not keys:
+		return
+
+	frappe.db.sql(
+		"""
+		UPDATE `tabMaterial Request Reservation`
+		SET material_request = %(material_request)s
+		WHERE name IN %(keys)s AND IFNULL(material_request, '') = ''
+		""",
+		{"material_request": doc.name, "keys": tuple(keys)},
+	)
+
+
+@instrument_hook
+def release_reservations(doc, method=None):
+	"""
+	Hook for Material Request on_cancel/on_trash - free the item and warehouse for a new request
+	"""
+	frappe.db.delete("Material Request Reservation", {"material_request": doc.name})
+
+
+def purge_expired_reservations():
+	"""
+	Reservations only guard requests created on their own date, older ones can go
+	"""
+	frappe.db.delete("Material Request Reservation", {"reservation_date": ("<", nowdate())})
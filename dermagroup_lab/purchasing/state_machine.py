@@ -0,0 +1,131 @@
+import frappe
+from frappe import _
+
+from dermagroup_lab.purchasing.enums import ApprovalStatus
+
+# docstatus, from status, to status, action label, role allowed to trigger it from the UI
+TRANSITIONS = (
+	(
+		0,
+		ApprovalStatus.PENDING_APPROVAL,
+		ApprovalStatus.APPROVED,
+		"Approve",
+		"Purchasing Manager",
+	),
+	(
+		1,
+		ApprovalStatus.APPROVED,
+		ApprovalStatus.SENT_TO_SUPPLIER,
+		"Send to Supplier",
+		"Purchasing Manager",
+	),
+	(
+		1,
+		ApprovalStatus.SENT_TO_SUPPLIER,
+		ApprovalStatus.CONFIRMED,
+		"Confirm Receipt",
+		"Purchasing Manager",
+	),
+	(
+		1,
+		ApprovalStatus.SENT_TO_SUPPLIER,
+		ApprovalStatus.PENDING_DELIVERY,
+		"Mark Pending Delivery",
+		"Purchasing Manager",
+	),
+	(
+		1,
+		ApprovalStatus.PENDING_DELIVERY,
+		ApprovalStatus.CONFIRMED,
+		"Confirm Receipt",
+		"Purchasing Manager",
+	),
+)
+
+# Statuses a Material Request can be cancelled from, cancellation sets CANCELLED
+CANCELLABLE = frozenset(
+	(
+		ApprovalStatus.APPROVED.value,
+		ApprovalStatus.SENT_TO_SUPPLIER.value,
+		ApprovalStatus.CONFIRMED.value,
+		ApprovalStatus.PENDING_DELIVERY.value,
+	)
+)
+
+
+def _build_transition_table():
+	table = {}
+	for docstatus, from_status, to_status, _label, _role in TRANSITIONS:
+		key = (docstatus, from_status.value)
+		table[key] = table.get(key, frozenset()) | {to_status.value}
+	return table
+
+
+# (docstatus, from status) -> frozenset of statuses it can move to
+TRANSITION_TABLE = _build_transition_table()
+
+
+def can_transition(docstatus, from_status, to_status):
+	"""
+	O(1) check of a status change, keeping the same status is always allowed
+	"""
+	if from_status == to_status:
+		return True
+	if to_status == ApprovalStatus.CANCELLED.value:
+		return from_status in CANCELLABLE
+	return to_status in TRANSITION_TABLE.get((docstatus, from_status), ())
+
+
+def validate_transition(doc):
+	"""
+	Raise if the status change of a saved document is not an allowed transition
+	"""
+	doc_before_save = doc.get_doc_before_save()
+	if not doc_before_save:
+		return
+
+	if not can_transition(doc_before_save.docstatus, doc_before_save.status, doc.status):
+		frappe.throw(
+			_("Cannot change status from {0} to {1}").format(_(doc_before_save.status), _(doc.status))
+		)
+
+
+def run_transition_hooks(transitions):
+	"""
+	Run the material_request_status_hooks registered in hooks.py for a batch of transitions.
+	Hooks are keyed by "<to status>" or "<from status> -> <to status>" and receive the list
+	of documents that made the same transition.
+	transitions: iterable of (doc, from status) with doc.status as the new status
+	"""
+	grouped = {}
+	for doc, from_status in transitions:
+		if from_status == doc.status:
+			continue
+		grouped.setdefault((from_status, doc.status), []).append(doc)
+
+	if not grouped:
+		return
+
+	status_hooks = frappe.get_hooks("material_request_status_hooks") or {}
+	for (from_status, to_status), docs in grouped.items():
+		for key in (f"{from_status} -> {to_status}", to_status):
+			for hook in status_hooks.get(key, ()):
+				frappe.get_attr(hook)(docs)
+
+
+@frappe.whitelist()
+def get_transition_table():
+	"""
+	Transition table for the client, static for a given deploy so the client fetches it once
+	Returns: list of dicts with docstatus, from_status, to_status, label, role
+	"""
+	return [
+		{
+			"docstatus": docstatus,
+			"from_status": from_status.value,
+			"to_status": to_status.value,
+			"label": label,
+			"role": role,
+		}
+		for docstatus, from_status, to_status, label, role in TRANSITIONS
+	]
@@ -0,0 +1,61 @@
+import frappe
+from frappe import _
+
+from dermagroup_lab.purchasing.enums import ApprovalStatus
+from dermagroup_lab.purchasing.state_machine import can_transition, run_transition_hooks
+
+
+@frappe.whitelist()
+def update_status(name, status):
+	"""
+	Move a Material Request to a new status
+	Returns: the updated document, so the form can sync it without reloading
+	"""
+	doc, _from_status = _apply_status(name, status)
+	return doc
+
+
+@frappe.whitelist()
+def bulk_update_status(names, status):
+	"""
+	Move many Material Requests to a new status in one request. Each document is validated
+	and saved on its own savepoint, and the status hooks run once for the batch.
+	Returns: list of dicts with name, success and message
+	"""
+	if isinstance(names, str):
+		names = frappe.parse_json(names)
+
+	results, transitions = [], []
+	for name in dict.fromkeys(names or []):
+		frappe.db.savepoint("bulk_update_status")
+		try:
+			doc, from_status = _apply_status(name, status, in_bulk=True)
+		except Exception as e:
+			frappe.db.rollback(save_point="bulk_update_status")
+			frappe.clear_messages()
+			results.append({"name": name, "success": False, "message": str(e)})
+		else:
+			transitions.append((doc, from_status))
+			results.append({"name": name, "success": True, "message": None})
+
+	run_transition_hooks(transitions)
+	return results
+
+
+def _apply_status(name, status, in_bulk=False):
+	if status not in {approval_status.value for approval_status in ApprovalStatus}:
+		frappe.throw(_("Invalid status: {0}").format(status))
+
+	doc = frappe.get_doc("Material Request", name)
+	doc.check_permission("write")
+
+	from_status = doc.status
+	if not can_transition(doc.docstatus, from_status, status):
+		frappe.throw(_("Cannot change status from {0} to {1}").format(_(from_status), _(status)))
+	if status == ApprovalStatus.SENT_TO_SUPPLIER.value and not doc.get("supplier_email"):
+		frappe.throw(_("Supplier email is required"))
+
+	doc.status = status
+	doc.flags.in_bulk_status_update = in_bulk
+	doc.save()
+	return doc, from_status
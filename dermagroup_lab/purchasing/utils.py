@@ -1,100 +1,159 @@
 import frappe
 from frappe import _
-from frappe.utils import add_days, flt, nowdate
+from frappe.utils import flt
 
-from dermagroup_lab.purchasing.notifications import notify_purchasing_of_material_request
-from dermagroup_lab.purchasing.validations import check_duplicate_requests
+from dermagroup_lab.instrumentation import instrument_hook
+from dermagroup_lab.purchasing.consolidation import (
+	consolidate_shortages,
+	create_consolidated_material_requests,
+)
+from dermagroup_lab.purchasing.demand import get_open_demand_map, get_work_order_requirements
+from dermagroup_lab.purchasing.last_purchase import get_last_purchase_map
+from dermagroup_lab.purchasing.notifications import material_request_digest
+from dermagroup_lab.purchasing.validations import check_duplicate_requests_bulk
+
+# Days back a similar Material Request makes a shortage item a duplicate
+DUPLICATE_REQUEST_DAYS = 3
 
 
 @frappe.whitelist()
 def get_last_purchase_details(item_code=None, warehouse=None):
 	"""
 	Get details from the last purchase order for an item
-	Returns: dict with purchase_order, supplier, posting_date, qty, rate
+	Returns: dict with purchase_order, supplier, qty, rate
 	"""
-	filters = {"docstatus": 1}
+	if not item_code:
+		return {}
 
-	if warehouse:
-		filters["warehouse"] = warehouse
+	return get_last_purchase_map([(item_code, warehouse)]).get((item_code, warehouse), {})
 
-	if item_code:
-		filters["item_code"] = item_code
 
-	# Get the most recent purchase receipt item
-	last_purchase = frappe.db.get_all(
-		"Purchase Receipt Item",
-		filters=filters,
-		fields=["parent", "qty", "rate", "creation"],
-		order_by="creation desc",
-		limit=1,
-	)
+@frappe.whitelist()
+def get_last_purchase_details_bulk(rows):
+	"""
+	Get details from the last purchase for many (item_code, warehouse) rows at once
+	Returns: list of dicts with item_code, warehouse and the get_last_purchase_details fields
+	"""
+	if isinstance(rows, str):
+		rows = frappe.parse_json(rows)
 
-	if not last_purchase:
-		# Try Purchase Order if no receipt found
-		last_purchase = frappe.db.get_all(
-			"Purchase Order Item",
-			filters=filters,
-			fields=["parent", "qty", "rate", "schedule_date as posting_date"],
-			order_by="schedule_date desc",
-			limit=1,
-		)
-
-	if last_purchase:
-		purchase_doc = last_purchase[0]
-
-		# Get supplier from parent document
-		parent_doctype = (
-			"Purchase Receipt"
-			if frappe.db.exists("Purchase Receipt", purchase_doc.get("parent"))
-			else "Purchase Order"
-		)
-		supplier = frappe.db.get_value(parent_doctype, purchase_doc.get("parent"), "supplier")
-
-		return {
-			"purchase_order": purchase_doc.get("parent"),
-			"supplier": supplier,
-			"qty": purchase_doc.get("qty"),
-			"rate": purchase_doc.get("rate"),
-		}
+	rows = [_as_pair(row) for row in rows or []]
+	details = get_last_purchase_map(rows)
 
-	return {}
+	return [
+		{"item_code": item_code, "warehouse": warehouse, **details.get((item_code, warehouse), {})}
+		for item_code, warehouse in rows
+	]
 
 
 @frappe.whitelist()
 def get_stock_projection(item_code, warehouse):
 	"""
-	Calculate projected stock: Current + In Transit - Reserved
-	Returns: dict with actual_qty, ordered_qty, reserved_qty, projected_qty, reorder_level
+	Calculate projected stock: Current + In Transit - Reserved, and the demand-aware projection
+	that replaces the production reservations with the open requirements of all Work Orders
+	Returns: dict with actual_qty, ordered_qty, reserved_qty, projected_qty, reorder_level,
+	reserved_qty_for_production, open_demand, demand_projected_qty
+	"""
+	return get_stock_projection_map([(item_code, warehouse)])[(item_code, warehouse)]
+
+
+@frappe.whitelist()
+def get_stock_projections(pairs):
+	"""
+	Calculate projected stock for many (item_code, warehouse) pairs at once
+	Returns: list of dicts with item_code, warehouse and the get_stock_projection fields
 	"""
-	# Get current stock from Bin
-	bin_data = (
-		frappe.db.get_value(
-			"Bin",
-			{"item_code": item_code, "warehouse": warehouse},
-			["actual_qty", "ordered_qty", "reserved_qty", "projected_qty"],
+	if isinstance(pairs, str):
+		pairs = frappe.parse_json(pairs)
+
+	pairs = [_as_pair(pair) for pair in pairs or []]
+	projections = get_stock_projection_map(pairs)
+
+	return [
+		{"item_code": item_code, "warehouse": warehouse, **projections[(item_code, warehouse)]}
+		for item_code, warehouse in pairs
+	]
+
+
+def get_stock_projection_map(pairs):
+	"""
+	Load Bin, Item Reorder and Item Demand data for the given pairs with one query per table
+	Returns: dict of (item_code, warehouse) -> get_stock_projection dict
+	"""
+	pairs = set(pairs)
+	item_codes = tuple({item_code for item_code, warehouse in pairs if item_code and warehouse})
+	warehouses = tuple({warehouse for item_code, warehouse in pairs if item_code and warehouse})
+	bins, reorder_levels = {}, {}
+
+	if item_codes:
+		for row in frappe.db.sql(
+			"""
+			SELECT
+				item_code,
+				warehouse,
+				actual_qty,
+				ordered_qty,
+				reserved_qty,
+				projected_qty,
+				reserved_qty_for_production
+			FROM
+				`tabBin`
+			WHERE
+				item_code IN %(item_codes)s
+				AND warehouse IN %(warehouses)s
+			""",
+			{"item_codes": item_codes, "warehouses": warehouses},
 			as_dict=True,
-		)
-		or {}
-	)
+		):
+			bins[(row.item_code, row.warehouse)] = row
+
+		for row in frappe.db.sql(
+			"""
+			SELECT
+				parent AS item_code, warehouse, warehouse_reorder_level
+			FROM
+				`tabItem Reorder`
+			WHERE
+				parent IN %(item_codes)s
+				AND warehouse IN %(warehouses)s
+			""",
+			{"item_codes": item_codes, "warehouses": warehouses},
+			as_dict=True,
+		):
+			reorder_levels.setdefault((row.item_code, row.warehouse), row.warehouse_reorder_level)
+
+	open_demand = get_open_demand_map(pairs)
+
+	projections = {}
+	for pair in pairs:
+		bin_data = bins.get(pair) or {}
+		projected_qty = flt(bin_data.get("projected_qty", 0))
+		reserved_qty_for_production = flt(bin_data.get("reserved_qty_for_production", 0))
+		projections[pair] = {
+			"actual_qty": flt(bin_data.get("actual_qty", 0)),
+			"ordered_qty": flt(bin_data.get("ordered_qty", 0)),
+			"reserved_qty": flt(bin_data.get("reserved_qty", 0)),
+			"projected_qty": projected_qty,
+			"reorder_level": flt(reorder_levels.get(pair) or 0),
+			"reserved_qty_for_production": reserved_qty_for_production,
+			"open_demand": open_demand.get(pair, 0),
+			# Bin projections already subtract the production reservations, which cover part of
+			# the same requirements, so they are added back before the open demand is subtracted
+			"demand_projected_qty": projected_qty + reserved_qty_for_production - open_demand.get(pair, 0),
+		}
 
-	# Get reorder level from Item Reorder
-	reorder_level = (
-		frappe.db.get_value(
-			"Item Reorder", {"parent": item_code, "warehouse": warehouse}, "warehouse_reorder_level"
-		)
-		or 0
-	)
+	return projections
 
-	return {
-		"actual_qty": flt(bin_data.get("actual_qty", 0)),
-		"ordered_qty": flt(bin_data.get("ordered_qty", 0)),
-		"reserved_qty": flt(bin_data.get("reserved_qty", 0)),
-		"projected_qty": flt(bin_data.get("projected_qty", 0)),
-		"reorder_level": flt(reorder_level),
-	}
+
+def _as_pair(pair):
+	if isinstance(pair, dict):
+		return (pair.get("item_code"), pair.get("warehouse"))
+	item_code, warehouse = pair
+	return (item_code, warehouse)
 
 
 @frappe.whitelist()
+@instrument_hook
 def validate_stock_before_production(doc, method):
 	"""
 	Hook for Work Order - validate stock before creating production order
@@ -103,100 +162,127 @@ def validate_stock_before_production(doc, method):
 	if doc.doctype != "Work Order":
 		return
 
-	# Get required items from BOM
-	bom_items = frappe.db.sql(
-		"""
-		SELECT
-			item_code,
-			qty,
-			stock_uom,
-			source_warehouse
-		FROM
-			`tabBOM Item`
-		WHERE
-			parent = %(bom)s
-	""",
-		{"bom": doc.bom_no},
-		as_dict=True,
-	)
+	# Aggregate leaf requirements of the full BOM tree per item and warehouse
+	requirements = get_work_order_requirements(doc)
 
 	insufficient_items = []
 
-	for item in bom_items:
-		# Calculate required qty based on production qty
-		required_qty = flt(item.qty) * flt(doc.qty)
-
-		# Get stock projection
-		warehouse = item.source_warehouse or doc.source_warehouse
-		if not warehouse:
-			continue
+	# Get stock projections for every leaf at once, net of the other open Work Orders
+	projections = get_stock_projection_map(requirements)
 
-		stock_data = get_stock_projection(item.item_code, warehouse)
+	for (item_code, warehouse), requirement in requirements.items():
+		required_qty = requirement["required_qty"]
+		available_qty = projections[(item_code, warehouse)]["demand_projected_qty"]
 
-		if stock_data.get("projected_qty", 0) < required_qty:
+		if available_qty < required_qty:
 			insufficient_items.append(
 				{
-					"item_code": item.item_code,
+					"item_code": item_code,
 					"required_qty": required_qty,
-					"available_qty": stock_data.get("projected_qty", 0),
-					"shortage": required_qty - stock_data.get("projected_qty", 0),
+					"available_qty": available_qty,
+					"shortage": required_qty - available_qty,
 					"warehouse": warehouse,
+					"stock_uom": requirement["stock_uom"],
 				}
 			)
 
-	# If there are insufficient items, create material requests
+	# If there are insufficient items, create material requests after the Work Order commits
 	if insufficient_items:
-		create_auto_material_requests(insufficient_items, doc)
+		job_id = enqueue_shortage_material_requests(insufficient_items, doc)
 
 		# Show message to user
-		msg = _("Material Requests created for insufficient stock items:")
+		msg = _("Material Requests are being created for insufficient stock items:")
 		for item in insufficient_items:
 			msg += f"<br>• {item['item_code']}: Shortage of {item['shortage']} {item.get('stock_uom', '')}"
+		msg += "<br><br>" + _("You will be notified when they are ready. Job: {0}").format(job_id)
 
 		frappe.msgprint(msg, title=_("Stock Shortage"), indicator="orange")
 
 
-def create_auto_material_requests(items, work_order_doc):
+def get_shortage_job_id(work_order):
+	return f"shortage_material_requests::{work_order}"
+
+
+def enqueue_shortage_material_requests(items, work_order_doc):
+	"""
+	Queue the Material Requests for a Work Order shortage, to be created once the Work Order
+	submit has committed
+	Returns: the job id
+	"""
+	job_id = get_shortage_job_id(work_order_doc.name)
+	frappe.enqueue(
+		"dermagroup_lab.purchasing.utils.create_shortage_material_requests",
+		queue="short",
+		job_id=job_id,
+		deduplicate=True,
+		enqueue_after_commit=True,
+		work_order=work_order_doc.name,
+		company=work_order_doc.company,
+		items=items,
+		user=frappe.session.user,
+	)
+	return job_id
+
+
+def create_shortage_material_requests(work_order, company, items, user):
 	"""
-	Create material requests for items with insufficient stock
+	Background job - create the shortage Material Requests of a submitted Work Order and tell
+	the planner which ones were created
 	"""
+	result = {
+		"work_order": work_order,
+		"job_id": get_shortage_job_id(work_order),
+		"duplicate_days": DUPLICATE_REQUEST_DAYS,
+		"error": None,
+	}
+	try:
+		created, skipped = create_auto_material_requests(items, company)
+		frappe.db.commit()
+		result["material_requests"] = [
+			{"name": mr_name, "items": [row["item_code"] for row in group["items"]]}
+			for mr_name, group in created
+		]
+		result["skipped"] = skipped
+	except Exception:
+		frappe.db.rollback()
+		frappe.log_error(f"Shortage Material Requests for {work_order} failed")
+		result["error"] = _("Material Requests for {0} could not be created").format(work_order)
+
+	frappe.publish_realtime("shortage_material_requests", result, user=user, after_commit=True)
+	frappe.db.commit()
+
+
+def create_auto_material_requests(items, company):
+	"""
+	Create material requests for items with insufficient stock, one per company, warehouse
+	and suggested supplier
+	Returns: list of (Material Request name, group) tuples and list of the item codes skipped
+	as duplicates
+	"""
+	# Check if similar requests exist in the duplicate window, for every item at once
+	duplicates = check_duplicate_requests_bulk(
+		[item_data["item_code"] for item_data in items], days=DUPLICATE_REQUEST_DAYS
+	)
+
+	shortages, skipped = {}, []
 	for item_data in items:
-		# Check if similar request exists in last 3 days
-		duplicates = check_duplicate_requests(item_data["item_code"], days=3)
-
-		if duplicates:
-			frappe.msgprint(
-				_("Skipped {0} because a similar Material Request exists in the last {1} days").format(
-					frappe.bold(item_data["item_code"]), 3
-				)
-			)
+		# Like the reorder run, one request per item: the first request made the item a duplicate
+		# for any other warehouse it is short in
+		if item_data["item_code"] in duplicates or item_data["item_code"] in shortages:
+			skipped.append(item_data["item_code"])
 			continue
 
-		# Create new Material Request
-		mr = frappe.new_doc("Material Request")
-		mr.material_request_type = "Purchase"
-		mr.company = work_order_doc.company
-		mr.transaction_date = nowdate()
-		mr.schedule_date = add_days(nowdate(), 7)  # Default 7 days lead time
-		mr.auto_created_via_reorder = 1
-
-		# Add item
-		mr.append(
-			"items",
-			{
-				"item_code": item_data["item_code"],
-				"qty": item_data["shortage"],
-				"warehouse": item_data["warehouse"],
-				"schedule_date": add_days(nowdate(), 7),
-			},
-		)
-
-		# Save and submit
-		mr.flags.ignore_mandatory = True
-		mr.insert()
-		mr.submit()
-		notify_purchasing_of_material_request(mr)
-
-		frappe.msgprint(
-			_("Material Request {0} created for {1}").format(frappe.bold(mr.name), item_data["item_code"])
-		)
+		shortages[item_data["item_code"]] = {
+			"item_code": item_data["item_code"],
+			"warehouse": item_data["warehouse"],
+			"company": company,
+			"qty": item_data["shortage"],
+		}
+
+	if not shortages:
+		return [], skipped
+
+	with material_request_digest():
+		created = create_consolidated_material_requests(consolidate_shortages(list(shortages.values())))
+
+	return created, skipped
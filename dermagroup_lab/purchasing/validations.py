@@ -8,10 +8,27 @@ def check_duplicate_requests(item_code, supplier=None, days=3):
 	Check for duplicate material requests in the last N days
 	Returns: list of similar material requests
 	"""
+	return check_duplicate_requests_bulk([item_code], supplier=supplier, days=days).get(item_code, [])
+
+
+@frappe.whitelist()
+def check_duplicate_requests_bulk(item_codes, supplier=None, days=3):
+	"""
+	Check for duplicate material requests in the last N days for many items in one query
+	Returns: dict of item_code -> list of similar material requests
+	"""
+	if isinstance(item_codes, str):
+		item_codes = frappe.parse_json(item_codes)
+
+	item_codes = tuple({item_code for item_code in item_codes or [] if item_code})
+	if not item_codes:
+		return {}
+
 	cutoff_date = add_days(nowdate(), -int(days))
 
 	query = """
 		SELECT
+			mri.item_code,
 			mr.name,
 			mr.transaction_date,
 			mr.status,
@@ -22,7 +39,7 @@ def check_duplicate_requests(item_code, supplier=None, days=3):
 		INNER JOIN
 			`tabMaterial Request Item` mri ON mri.parent = mr.name
 		WHERE
-			mri.item_code = %(item_code)s
+			mri.item_code IN %(item_codes)s
 		"""
 	if supplier:
 		query += "AND mr.suggested_supplier = %(supplier)s"
@@ -32,6 +49,12 @@ def check_duplicate_requests(item_code, supplier=None, days=3):
 		AND mr.material_request_type = 'Purchase'
 		ORDER BY
 			mr.transaction_date DESC"""
-	return frappe.db.sql(
-		query, {"item_code": item_code, "supplier": supplier, "cutoff_date": cutoff_date}, as_dict=True
+	rows = frappe.db.sql(
+		query, {"item_codes": item_codes, "supplier": supplier, "cutoff_date": cutoff_date}, as_dict=True
 	)
+
+	duplicates = {}
+	for row in rows:
+		duplicates.setdefault(row.pop("item_code"), []).append(row)
+
+	return duplicates
@@ -0,0 +1,72 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from dermagroup_lab.purchasing.bom import explode_bom
+
+TOP_BOM = "_Test BOM Explode Top"
+SUB_BOM = "_Test BOM Explode Sub"
+
+
+class TestExplodeBom(FrappeTestCase):
+	def setUp(self):
+		# Only the columns read by the explosion query, the BOM controller is not involved
+		self.make_bom(
+			TOP_BOM,
+			quantity=2,
+			items=[
+				{"item_code": "_Test Sub Assembly", "stock_qty": 4, "bom_no": SUB_BOM},
+				{"item_code": "_Test Raw X", "stock_qty": 6},
+				{"item_code": "_Test Kept Assembly", "stock_qty": 1, "bom_no": SUB_BOM, "do_not_explode": 1},
+			],
+		)
+		self.make_bom(
+			SUB_BOM,
+			quantity=5,
+			items=[
+				{"item_code": "_Test Raw X", "stock_qty": 10},
+				{"item_code": "_Test Raw Y", "stock_qty": 2.5},
+			],
+		)
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def make_bom(self, name, quantity, items):
+		frappe.get_doc({"doctype": "BOM", "name": name, "item": name, "quantity": quantity}).db_insert()
+		for idx, item in enumerate(items, start=1):
+			frappe.get_doc(
+				{
+					"doctype": "BOM Item",
+					"parent": name,
+					"parenttype": "BOM",
+					"parentfield": "items",
+					"idx": idx,
+					"stock_uom": "Nos",
+					"bom_no": "",
+					"do_not_explode": 0,
+					**item,
+				}
+			).db_insert()
+
+	def get_leaf_qtys(self):
+		return {row["item_code"]: row["qty_per_unit"] for row in explode_bom(TOP_BOM)}
+
+	def test_quantities_scale_across_levels(self):
+		assert self.get_leaf_qtys() == {
+			# 6 / 2 directly, plus 4 / 2 sub-assemblies of 10 / 5 each
+			"_Test Raw X": 3 + 2 * 2,
+			# 4 / 2 sub-assemblies of 2.5 / 5 each
+			"_Test Raw Y": 2 * 0.5,
+			# Not exploded, kept as a leaf
+			"_Test Kept Assembly": 0.5,
+		}
+
+	def test_sub_assemblies_at_max_depth_are_kept(self):
+		with patch("dermagroup_lab.purchasing.bom.MAX_BOM_DEPTH", 1):
+			assert self.get_leaf_qtys() == {
+				"_Test Sub Assembly": 2,
+				"_Test Raw X": 3,
+				"_Test Kept Assembly": 0.5,
+			}
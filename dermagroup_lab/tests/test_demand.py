@@ -0,0 +1,152 @@
+from unittest.mock import patch
+
+import frappe
+from erpnext.manufacturing.doctype.work_order.test_work_order import make_wo_order_test_record
+from erpnext.manufacturing.doctype.work_order.work_order import (
+	make_stock_entry as make_work_order_stock_entry,
+)
+from erpnext.stock.doctype.item.test_item import make_item
+from erpnext.stock.doctype.stock_entry.stock_entry_utils import make_stock_entry
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import flt
+
+from dermagroup_lab.purchasing.demand import (
+	_add_to_item_demand,
+	get_demand_key,
+	get_open_demand_map,
+	rebuild_demand_cache,
+)
+
+PAIR = ("_Test Demand Item", "_Test Warehouse - _TC")
+COMPANY = "_Test Company"
+WAREHOUSE = "_Test Warehouse - _TC"
+FINISHED_ITEM = "_Test Demand Finished Item"
+RAW_ITEM = "_Test Demand Raw Item"
+PAIR_RAW = (RAW_ITEM, WAREHOUSE)
+
+
+class TestItemDemand(FrappeTestCase):
+	def tearDown(self):
+		frappe.db.delete("Item Demand", {"item_code": PAIR[0]})
+
+	def test_deltas_accumulate_per_pair(self):
+		_add_to_item_demand({PAIR: 10})
+		_add_to_item_demand({PAIR: 5})
+		assert get_open_demand_map([PAIR]) == {PAIR: 10 + 5}
+
+		_add_to_item_demand({PAIR: -12})
+		assert get_open_demand_map([PAIR]) == {PAIR: 3}
+
+	def test_open_demand_never_negative(self):
+		_add_to_item_demand({PAIR: 4})
+		_add_to_item_demand({PAIR: -10})
+		assert get_open_demand_map([PAIR]) == {PAIR: 0}
+
+	def test_pairs_without_demand(self):
+		assert get_open_demand_map([PAIR]) == {}
+		assert get_open_demand_map([]) == {}
+
+
+class WorkOrderTestCase(FrappeTestCase):
+	"""
+	Work Orders for one unit of a raw material per unit produced, taken from WAREHOUSE which
+	holds 10 units
+	"""
+
+	def setUp(self):
+		make_item(FINISHED_ITEM, {"is_stock_item": 1})
+		make_item(RAW_ITEM, {"is_stock_item": 1, "valuation_rate": 100})
+		make_stock_entry(item_code=RAW_ITEM, target=WAREHOUSE, qty=10, basic_rate=100)
+
+		self.bom = frappe.get_doc(
+			{
+				"doctype": "BOM",
+				"item": FINISHED_ITEM,
+				"company": COMPANY,
+				"currency": frappe.get_cached_value("Company", COMPANY, "default_currency"),
+				"quantity": 1,
+				"is_default": 1,
+				"rm_cost_as_per": "Valuation Rate",
+				"items": [{"item_code": RAW_ITEM, "qty": 1, "rate": 100, "source_warehouse": WAREHOUSE}],
+			}
+		)
+		self.bom.insert(ignore_permissions=True)
+		self.bom.submit()
+
+	def tearDown(self):
+		frappe.db.rollback()
+		frappe.flags.restored_work_order_demand = None
+
+	def make_work_order(self, qty):
+		work_order = make_wo_order_test_record(
+			item=FINISHED_ITEM, bom_no=self.bom.name, qty=qty, source_warehouse=WAREHOUSE, do_not_save=True
+		)
+		work_order.source_warehouse = WAREHOUSE
+		work_order.insert()
+		work_order.submit()
+		return work_order
+
+	def transfer_materials(self, work_order, qty):
+		stock_entry = frappe.get_doc(
+			make_work_order_stock_entry(work_order.name, "Material Transfer for Manufacture", qty)
+		)
+		stock_entry.insert()
+		stock_entry.submit()
+		return stock_entry
+
+
+class TestWorkOrderDemand(WorkOrderTestCase):
+	def get_open_qty(self, work_order):
+		return flt(
+			frappe.db.get_value("Work Order Demand", get_demand_key(work_order.name, *PAIR_RAW), "open_qty")
+		)
+
+	def test_submit_records_and_cancel_releases_demand(self):
+		work_order = self.make_work_order(qty=8)
+		assert self.get_open_qty(work_order) == 8
+		assert get_open_demand_map([PAIR_RAW]) == {PAIR_RAW: 8}
+
+		work_order.cancel()
+		assert not frappe.db.exists("Work Order Demand", {"work_order": work_order.name})
+		assert get_open_demand_map([PAIR_RAW]) == {PAIR_RAW: 0}
+
+	def test_second_work_order_sees_open_demand_of_the_first(self):
+		self.make_work_order(qty=8)
+
+		with patch("dermagroup_lab.purchasing.utils.enqueue_shortage_material_requests") as enqueue:
+			self.make_work_order(qty=8)
+
+		shortages, _work_order = enqueue.call_args.args
+		assert [(row["item_code"], row["shortage"]) for row in shortages] == [(RAW_ITEM, 6)]
+
+	def test_stock_entry_lowers_and_restores_open_qty(self):
+		work_order = self.make_work_order(qty=8)
+		stock_entry = self.transfer_materials(work_order, qty=3)
+		assert self.get_open_qty(work_order) == 5
+		assert get_open_demand_map([PAIR_RAW]) == {PAIR_RAW: 5}
+
+		stock_entry.cancel()
+		assert self.get_open_qty(work_order) == 8
+		assert get_open_demand_map([PAIR_RAW]) == {PAIR_RAW: 8}
+
+	def test_released_demand_is_restored_when_reopened(self):
+		work_order = self.make_work_order(qty=8)
+		self.transfer_materials(work_order, qty=3)
+
+		work_order.reload()
+		work_order.db_set("status", "Closed")
+		assert get_open_demand_map([PAIR_RAW]) == {PAIR_RAW: 0}
+
+		work_order.db_set("status", "In Process")
+		assert self.get_open_qty(work_order) == 5
+		assert get_open_demand_map([PAIR_RAW]) == {PAIR_RAW: 5}
+
+	def test_rebuild_matches_maintained_demand(self):
+		work_order = self.make_work_order(qty=8)
+		self.transfer_materials(work_order, qty=3)
+
+		with patch.object(frappe.db, "commit"):
+			rebuild_demand_cache()
+
+		assert self.get_open_qty(work_order) == 5
+		assert get_open_demand_map([PAIR_RAW]) == {PAIR_RAW: 5}
@@ -0,0 +1,70 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from dermagroup_lab.purchasing.indexes import APP_INDEXES, ensure_indexes, verify_indexes
+from dermagroup_lab.purchasing.last_purchase import get_latest_purchases_from_history
+from dermagroup_lab.purchasing.reorder import get_recently_requested_items, get_reorder_rows
+from dermagroup_lab.purchasing.validations import check_duplicate_requests_bulk
+
+INDEX_NAMES = {doctype: index_name for doctype, index_name, _columns in APP_INDEXES}
+
+
+class TestAppIndexes(FrappeTestCase):
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		ensure_indexes()
+
+	def capture_queries(self, fn, *args):
+		"""Run fn and return the (query, values) it sent to the database"""
+		queries = []
+		sql = frappe.db.sql
+
+		def capturing_sql(query, values=(), *sql_args, **sql_kwargs):
+			queries.append((query, values))
+			return sql(query, values, *sql_args, **sql_kwargs)
+
+		with patch.object(frappe.db, "sql", capturing_sql):
+			fn(*args)
+		return queries
+
+	def assert_uses_app_index(self, fn, *args, tables):
+		"""
+		EXPLAIN every query of fn and fail when one of the given tables (alias -> doctype) has
+		no app index among its usable keys, i.e. it can only be read with a full scan
+		"""
+		plans = []
+		for query, values in self.capture_queries(fn, *args):
+			plans.extend(frappe.db.sql(f"EXPLAIN {query}", values, as_dict=True))
+
+		for alias, doctype in tables.items():
+			rows = [row for row in plans if row.table == alias]
+			assert rows, f"{alias} not found in query plan"
+			for row in rows:
+				possible_keys = (row.possible_keys or "").split(",")
+				assert INDEX_NAMES[doctype] in possible_keys, f"{alias} falls back to a full scan: {row}"
+
+	def test_indexes_are_provisioned(self):
+		assert not verify_indexes()
+
+	def test_duplicate_check_uses_index(self):
+		self.assert_uses_app_index(
+			check_duplicate_requests_bulk, ["_Test Item"], tables={"mri": "Material Request Item"}
+		)
+
+	def test_recently_requested_items_uses_index(self):
+		self.assert_uses_app_index(get_recently_requested_items, tables={"mr": "Material Request"})
+
+	def test_last_purchase_history_uses_index(self):
+		for source_doctype in ("Purchase Receipt", "Purchase Order"):
+			self.assert_uses_app_index(
+				get_latest_purchases_from_history,
+				source_doctype,
+				["_Test Item"],
+				tables={"pi": f"{source_doctype} Item"},
+			)
+
+	def test_reorder_rows_use_index(self):
+		self.assert_uses_app_index(get_reorder_rows, tables={"ir": "Item Reorder"})
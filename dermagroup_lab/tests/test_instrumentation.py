@@ -0,0 +1,98 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from dermagroup_lab.instrumentation import (
+	INSTRUMENTATION_FLAG,
+	instrument_hook,
+	summarize_hook_records,
+)
+
+
+@instrument_hook
+def _query_items(item_codes):
+	for item_code in item_codes:
+		frappe.db.sql("select name from `tabItem` where name = %s", item_code)
+
+
+class TestHookInstrumentation(FrappeTestCase):
+	def get_registered_hooks(self):
+		hooks = frappe.get_hooks(app_name="dermagroup_lab")
+		paths = [hooks.get("after_install"), hooks.get("before_migrate"), hooks.get("after_migrate")]
+		for events in hooks.get("doc_events", {}).values():
+			paths.extend(events.values())
+		for event_hooks in hooks.get("scheduler_events", {}).values():
+			if isinstance(event_hooks, dict):
+				for cron_hooks in event_hooks.values():
+					paths.extend(cron_hooks)
+			else:
+				paths.extend(event_hooks)
+		for status_hooks in hooks.get("material_request_status_hooks", {}).values():
+			paths.extend(status_hooks)
+
+		flattened = []
+		for path in paths:
+			flattened.extend(path if isinstance(path, list | tuple) else [path])
+		return {path for path in flattened if path}
+
+	def test_every_hook_is_instrumented(self):
+		for path in self.get_registered_hooks():
+			assert getattr(frappe.get_attr(path), "__instrumented__", False), path
+
+	def test_records_sql_of_hook_call(self):
+		records = []
+		with (
+			patch.dict(frappe.conf, {INSTRUMENTATION_FLAG: 1}),
+			patch("dermagroup_lab.instrumentation.write_hook_record", records.append),
+		):
+			_query_items(["_Test Item A", "_Test Item B", "_Test Item C"])
+
+		assert len(records) == 1
+		assert records[0]["hook"].endswith("_query_items")
+		assert records[0]["sql_count"] == 3
+		assert records[0]["max_repeated"] == 3
+		assert "sql" not in frappe.db.__dict__
+
+	def test_disabled_by_default(self):
+		records = []
+		with (
+			patch.dict(frappe.conf, {INSTRUMENTATION_FLAG: 0}),
+			patch("dermagroup_lab.instrumentation.write_hook_record", records.append),
+		):
+			_query_items(["_Test Item A"])
+
+		assert not records
+
+	def test_summary_ranks_hooks(self):
+		records = [
+			{
+				"hook": "fast",
+				"wall_time": 0.01,
+				"sql_count": 1,
+				"sql_time": 0.001,
+				"rows": 1,
+				"max_repeated": 1,
+			},
+			{
+				"hook": "slow",
+				"wall_time": 0.5,
+				"sql_count": 40,
+				"sql_time": 0.3,
+				"rows": 40,
+				"max_repeated": 40,
+			},
+			{
+				"hook": "slow",
+				"wall_time": 0.3,
+				"sql_count": 20,
+				"sql_time": 0.2,
+				"rows": 20,
+				"max_repeated": 20,
+			},
+		]
+		report = summarize_hook_records(records)
+		assert [summary["hook"] for summary in report["slowest"]] == ["slow", "fast"]
+		assert [summary["hook"] for summary in report["n_plus_one"]] == ["slow"]
+		assert report["slowest"][0]["calls"] == 2
+		assert report["slowest"][0]["max_repeated"] == 40
@@ -0,0 +1,37 @@
+import frappe
+from erpnext.stock.doctype.purchase_receipt.test_purchase_receipt import make_purchase_receipt
+from frappe.tests.utils import FrappeTestCase
+
+from dermagroup_lab.purchasing.last_purchase import get_index_key
+
+ITEM = "_Test Item"
+WAREHOUSE = "_Test Warehouse - _TC"
+
+
+class TestLastPurchaseIndex(FrappeTestCase):
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def get_indexed_source(self, warehouse=None):
+		return frappe.db.get_value(
+			"Item Last Purchase", get_index_key("Purchase Receipt", ITEM, warehouse), "source_name"
+		)
+
+	def test_cancel_restores_previous_receipt(self):
+		older = make_purchase_receipt(item_code=ITEM, warehouse=WAREHOUSE, qty=5, rate=100)
+		newer = make_purchase_receipt(item_code=ITEM, warehouse=WAREHOUSE, qty=3, rate=120)
+
+		assert self.get_indexed_source(WAREHOUSE) == newer.name
+		# The any warehouse entry follows the latest receipt too
+		assert self.get_indexed_source() == newer.name
+
+		newer.cancel()
+
+		assert self.get_indexed_source(WAREHOUSE) == older.name
+		assert self.get_indexed_source() == older.name
+		assert (
+			frappe.db.get_value(
+				"Item Last Purchase", get_index_key("Purchase Receipt", ITEM, WAREHOUSE), "rate"
+			)
+			== 100
+		)
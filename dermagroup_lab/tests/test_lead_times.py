@@ -0,0 +1,156 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, flt, now, nowdate
+
+from dermagroup_lab.purchasing.lead_times import (
+	get_lead_time_key,
+	get_supplier_lead_time_map,
+	rebuild_supplier_lead_times,
+)
+
+SUPPLIER = "_Test Supplier"
+ITEM = "_Test Lead Time Item"
+PURCHASE_TYPE = "Importación"
+
+
+class TestSupplierLeadTimes(FrappeTestCase):
+	def setUp(self):
+		timestamp = now()
+		frappe.db.bulk_insert(
+			"Supplier Lead Time",
+			fields=[
+				"name",
+				"creation",
+				"modified",
+				"owner",
+				"modified_by",
+				"supplier",
+				"item_code",
+				"purchase_type",
+				"median_days",
+				"p90_days",
+				"sample_size",
+			],
+			values=[
+				(
+					get_lead_time_key(SUPPLIER, ITEM, purchase_type),
+					timestamp,
+					timestamp,
+					"Administrator",
+					"Administrator",
+					SUPPLIER,
+					ITEM,
+					purchase_type,
+					median_days,
+					p90_days,
+					4,
+				)
+				for purchase_type, median_days, p90_days in ((PURCHASE_TYPE, 40, 61.5), ("", 12.5, 45))
+			],
+		)
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def test_lookup_by_purchase_type(self):
+		lead_times = get_supplier_lead_time_map([(SUPPLIER, ITEM, PURCHASE_TYPE)])
+		assert lead_times[(SUPPLIER, ITEM, PURCHASE_TYPE)] == {
+			"median_days": 40,
+			"p90_days": 62,
+			"sample_size": 4,
+		}
+
+	def test_falls_back_to_every_purchase_type(self):
+		lead_times = get_supplier_lead_time_map(
+			[(SUPPLIER, ITEM, "Local"), (SUPPLIER, "_Test Item", "Local")]
+		)
+		assert lead_times == {
+			(SUPPLIER, ITEM, "Local"): {"median_days": 13, "p90_days": 45, "sample_size": 4}
+		}
+
+
+class TestRebuildSupplierLeadTimes(FrappeTestCase):
+	"""
+	One Purchase Order received in several Purchase Receipts, each a known number of days
+	after the order
+	"""
+
+	def setUp(self):
+		order_date = add_days(nowdate(), -90)
+		frappe.get_doc(
+			{
+				"doctype": "Purchase Order",
+				"name": "_T-Lead-Time-PO",
+				"supplier": SUPPLIER,
+				"transaction_date": order_date,
+				"docstatus": 1,
+			}
+		).db_insert()
+		frappe.get_doc(
+			{
+				"doctype": "Material Request",
+				"name": "_T-Lead-Time-MR",
+				"purchase_type": PURCHASE_TYPE,
+				"transaction_date": order_date,
+				"docstatus": 1,
+			}
+		).db_insert()
+
+		# Received against the typed request, without a request, and dated before the order
+		receipts = [(days, "_T-Lead-Time-MR") for days in (10, 20, 30, 40)] + [(50, None), (-5, None)]
+		for index, (days, material_request) in enumerate(receipts):
+			receipt = f"_T-Lead-Time-PR-{index}"
+			frappe.get_doc(
+				{
+					"doctype": "Purchase Receipt",
+					"name": receipt,
+					"supplier": SUPPLIER,
+					"posting_date": add_days(order_date, days),
+					"docstatus": 1,
+				}
+			).db_insert()
+			frappe.get_doc(
+				{
+					"doctype": "Purchase Receipt Item",
+					"name": f"{receipt}-item",
+					"parent": receipt,
+					"parenttype": "Purchase Receipt",
+					"parentfield": "items",
+					"item_code": ITEM,
+					"purchase_order": "_T-Lead-Time-PO",
+					"material_request": material_request,
+					"docstatus": 1,
+				}
+			).db_insert()
+
+		# The rebuild commits, the test data is rolled back instead
+		with patch("frappe.db.commit"):
+			rebuild_supplier_lead_times()
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def get_row(self, purchase_type=None):
+		row = frappe.db.get_value(
+			"Supplier Lead Time",
+			get_lead_time_key(SUPPLIER, ITEM, purchase_type),
+			["median_days", "p90_days", "sample_size"],
+			as_dict=True,
+		)
+		return (flt(row.median_days), flt(row.p90_days), row.sample_size)
+
+	def test_per_purchase_type_percentiles(self):
+		# 10, 20, 30, 40 days: p90 interpolates 70% of the way from 30 to 40
+		assert self.get_row(PURCHASE_TYPE) == (25, 37, 4)
+
+	def test_every_purchase_type_percentiles(self):
+		# 10, 20, 30, 40, 50 days, the receipt dated before the order left out
+		assert self.get_row() == (30, 46, 5)
+
+	def test_one_row_per_supplier_item_and_type(self):
+		rows = frappe.get_all(
+			"Supplier Lead Time", filters={"supplier": SUPPLIER, "item_code": ITEM}, pluck="purchase_type"
+		)
+		assert sorted(rows) == ["", PURCHASE_TYPE]
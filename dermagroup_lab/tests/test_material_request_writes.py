@@ -0,0 +1,93 @@
+import re
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import frappe
+from frappe.utils import add_days, nowdate
+
+from dermagroup_lab.purchasing.enums import ApprovalStatus
+from dermagroup_lab.purchasing.status import update_status
+from dermagroup_lab.tests.test_base import TestBase
+
+MATERIAL_REQUEST_UPDATE = re.compile(r"^\s*update\s+`tabMaterial Request`\s", re.IGNORECASE)
+# Statements issued by each operation on a single row Material Request, including ERPNext's
+# own, plus STATEMENT_MARGIN. When a change needs more statements, update the count together
+# with that change; the assertion message shows the new count.
+STATEMENT_MARGIN = 5
+# Modified check, link validation, parent and child row writes, Bin requested qty, version
+SUBMIT_STATEMENT_COUNT = 45
+# Same writes as submit, plus the reservation release
+CANCEL_STATEMENT_COUNT = 45
+# Document load, modified check, parent and child row writes, version, dispatch log
+STATUS_UPDATE_STATEMENT_COUNT = 22
+
+
+class TestMaterialRequestStatusWrites(TestBase):
+	@contextmanager
+	def record_statements(self):
+		"""Record every SQL statement issued inside the block"""
+		statements = []
+		sql = frappe.db.sql
+
+		def recording_sql(query, *args, **kwargs):
+			statements.append(str(query))
+			return sql(query, *args, **kwargs)
+
+		with patch.object(frappe.db, "sql", recording_sql):
+			yield statements
+
+	def get_material_request_updates(self, statements):
+		return [query for query in statements if MATERIAL_REQUEST_UPDATE.match(query)]
+
+	def make_approved_material_request(self):
+		mr = frappe.get_doc(
+			{
+				"doctype": "Material Request",
+				"material_request_type": "Purchase",
+				"transaction_date": nowdate(),
+				"schedule_date": add_days(nowdate(), 7),
+				"company": self.company,
+				"status": ApprovalStatus.APPROVED.value,
+				"supplier_email": "supplier@test.com",
+				"items": [
+					{
+						"item_code": self.test_item,
+						"qty": 10,
+						"uom": "Nos",
+						"warehouse": self.test_warehouse,
+						"schedule_date": add_days(nowdate(), 7),
+					}
+				],
+			}
+		)
+		mr.flags.skip_duplicate_check = True
+		mr.insert(ignore_links=True)
+		return mr
+
+	def test_submit_writes_status_once(self):
+		mr = self.make_approved_material_request()
+		with self.record_statements() as statements:
+			mr.submit()
+
+		assert len(self.get_material_request_updates(statements)) == 1
+		assert len(statements) <= SUBMIT_STATEMENT_COUNT + STATEMENT_MARGIN, len(statements)
+		assert frappe.db.get_value("Material Request", mr.name, "status") == ApprovalStatus.APPROVED.value
+
+	def test_cancel_writes_status_once(self):
+		mr = self.make_approved_material_request()
+		mr.submit()
+		with self.record_statements() as statements:
+			mr.cancel()
+
+		assert len(self.get_material_request_updates(statements)) == 1
+		assert len(statements) <= CANCEL_STATEMENT_COUNT + STATEMENT_MARGIN, len(statements)
+		assert frappe.db.get_value("Material Request", mr.name, "status") == ApprovalStatus.CANCELLED.value
+
+	def test_status_update_writes_once(self):
+		mr = self.make_approved_material_request()
+		mr.submit()
+		with self.record_statements() as statements:
+			update_status(mr.name, ApprovalStatus.SENT_TO_SUPPLIER.value)
+
+		assert len(self.get_material_request_updates(statements)) == 1
+		assert len(statements) <= STATUS_UPDATE_STATEMENT_COUNT + STATEMENT_MARGIN, len(statements)
@@ -0,0 +1,36 @@
+from frappe.tests.utils import FrappeTestCase
+
+from dermagroup_lab.purchasing.memo import RequestMemo
+
+
+class TestRequestMemo(FrappeTestCase):
+	def test_loads_once_and_counts(self):
+		memo, loads = RequestMemo(), []
+
+		def loader():
+			loads.append(1)
+			return "_Test Company"
+
+		for _i in range(3):
+			assert memo.get("warehouse_company", "_Test Warehouse - _TC", loader) == "_Test Company"
+
+		assert len(loads) == 1
+		assert memo.stats["warehouse_company"] == {"hits": 2, "misses": 1}
+
+	def test_bounded_size_evicts_least_recently_used(self):
+		memo = RequestMemo(max_size=2)
+		memo.get("item_lead_time", "A", lambda: 1)
+		memo.get("item_lead_time", "B", lambda: 2)
+		memo.get("item_lead_time", "A", lambda: 1)
+		memo.get("item_lead_time", "C", lambda: 3)
+		assert list(memo.namespaces["item_lead_time"]) == ["A", "C"]
+
+	def test_none_is_memoized_and_clear_reloads(self):
+		memo, loads = RequestMemo(), []
+		memo.get("supplier_email", "_Test Supplier", lambda: loads.append(1))
+		memo.get("supplier_email", "_Test Supplier", lambda: loads.append(1))
+		assert len(loads) == 1
+
+		memo.clear("supplier_email")
+		memo.get("supplier_email", "_Test Supplier", lambda: loads.append(1))
+		assert len(loads) == 2
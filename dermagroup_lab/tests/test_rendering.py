@@ -0,0 +1,35 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from dermagroup_lab.purchasing import rendering
+
+SUPPLIER_TEMPLATE = "templates/emails/material_request_to_supplier.html"
+
+
+class TestTemplateRendering(FrappeTestCase):
+	def setUp(self):
+		rendering.clear_compiled_templates()
+
+	def make_context(self, name):
+		doc = frappe._dict(name=name, items=[frappe._dict(item_code="_Test Item", qty=2, uom="Nos")])
+		return {"doc": doc, "supplier_name": "_Test Supplier"}
+
+	def test_matches_frappe_rendering(self):
+		context = self.make_context("MAT-MR-0001")
+		assert rendering.render_template(SUPPLIER_TEMPLATE, context) == frappe.render_template(
+			f"dermagroup_lab/{SUPPLIER_TEMPLATE}", context
+		)
+
+	def test_compiled_once_per_language(self):
+		rendering.render_template(SUPPLIER_TEMPLATE, self.make_context("MAT-MR-0001"))
+		rendering.render_templates(
+			SUPPLIER_TEMPLATE, [self.make_context("MAT-MR-0002"), self.make_context("MAT-MR-0003")]
+		)
+		assert len(rendering._compiled_templates) == 1
+
+	def test_batch_keeps_context_order(self):
+		rendered = rendering.render_templates(
+			SUPPLIER_TEMPLATE, [self.make_context("MAT-MR-0002"), self.make_context("MAT-MR-0003")]
+		)
+		assert "MAT-MR-0002" in rendered[0]
+		assert "MAT-MR-0003" in rendered[1]
@@ -0,0 +1,292 @@
+from functools import partial
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, nowdate
+
+from dermagroup_lab.purchasing.reorder import (
+	get_checkpoint,
+	get_checkpoint_key,
+	get_reorder_rows,
+	plan_reorders,
+	run_reorder,
+)
+from dermagroup_lab.purchasing.reorder_queue import (
+	DIRTY_PAIRS_KEY,
+	PROCESSING_PAIRS_KEY,
+	mark_pairs_dirty,
+	process_dirty_reorder_pairs,
+	take_dirty_pairs,
+)
+from dermagroup_lab.purchasing.reorder_shards import (
+	ACTIVE_RUN_KEY,
+	MAX_SHARD_ATTEMPTS,
+	finalize_stale_reorder_run,
+	get_shard_job_id,
+	inline_executor,
+	run_sharded_reorder,
+)
+
+SEEDED_ITEMS = [f"_Test Reorder Item {i}" for i in range(5)]
+SEEDED_WAREHOUSE = "_Test Warehouse - _TC"
+SEEDED_PAIRS = [(item_code, SEEDED_WAREHOUSE) for item_code in SEEDED_ITEMS]
+
+
+class ShardKilled(BaseException):
+	"""Stands for the worker being killed mid-run: no handler in the shard runs"""
+
+
+class TestPlanReorders(FrappeTestCase):
+	def make_row(self, **kwargs):
+		row = {
+			"item_code": "_Test Item",
+			"warehouse": "_Test Warehouse - _TC",
+			"reorder_level": 10,
+			"reorder_qty": 5,
+			"lead_time_days": None,
+			"projected_qty": 0,
+			"company": "_Test Company",
+		}
+		row.update(kwargs)
+		return row
+
+	def test_deficiency_above_reorder_qty(self):
+		plan = plan_reorders([self.make_row(projected_qty=2)])
+		assert plan[0]["qty"] == 8
+		assert plan[0]["lead_time_days"] == 7
+
+	def test_reorder_qty_when_deficiency_is_smaller(self):
+		plan = plan_reorders([self.make_row(projected_qty=8, lead_time_days=12)])
+		assert plan[0]["qty"] == 5
+		assert plan[0]["lead_time_days"] == 12
+
+	def test_skips_rows_above_reorder_level(self):
+		assert not plan_reorders([self.make_row(projected_qty=11)])
+
+	def test_one_request_per_item_per_run(self):
+		rows = [self.make_row(), self.make_row(warehouse="_Test Warehouse 2 - _TC")]
+		assert len(plan_reorders(rows)) == 1
+		assert not plan_reorders(rows, recently_requested={"_Test Item"})
+
+	def test_default_company_fallback(self):
+		plan = plan_reorders([self.make_row(company=None)], default_company="_Test Default")
+		assert plan[0]["company"] == "_Test Default"
+		assert not plan_reorders([self.make_row(company=None)])
+
+
+class ReorderRowsTestCase(FrappeTestCase):
+	"""
+	Seeds purchase reorder rows whose projected qty is above the reorder level, so runs over
+	them plan no requests. The rows are committed because the reorder run commits.
+	"""
+
+	def setUp(self):
+		for item_code in SEEDED_ITEMS:
+			frappe.get_doc(
+				{
+					"doctype": "Item",
+					"name": item_code,
+					"item_code": item_code,
+					"item_name": item_code,
+					"item_group": "Raw Material",
+					"stock_uom": "Nos",
+					"is_stock_item": 1,
+				}
+			).db_insert()
+			frappe.get_doc(
+				{
+					"doctype": "Item Reorder",
+					"name": frappe.generate_hash(length=10),
+					"parent": item_code,
+					"parenttype": "Item",
+					"parentfield": "reorder_levels",
+					"warehouse": SEEDED_WAREHOUSE,
+					"warehouse_reorder_level": 10,
+					"warehouse_reorder_qty": 5,
+					"material_request_type": "Purchase",
+				}
+			).db_insert()
+			frappe.get_doc(
+				{
+					"doctype": "Bin",
+					"name": frappe.generate_hash(length=10),
+					"item_code": item_code,
+					"warehouse": SEEDED_WAREHOUSE,
+					"projected_qty": 100,
+				}
+			).db_insert()
+		frappe.db.commit()
+
+	def tearDown(self):
+		frappe.db.rollback()
+		frappe.db.delete("Bin", {"item_code": ("in", SEEDED_ITEMS)})
+		frappe.db.delete("Item Reorder", {"parent": ("in", SEEDED_ITEMS)})
+		frappe.db.delete("Item", {"name": ("in", SEEDED_ITEMS)})
+		frappe.db.set_global(get_checkpoint_key(), None)
+		frappe.db.set_global(get_checkpoint_key(0, 1), None)
+		frappe.db.commit()
+
+	def restrict_to_seeded_rows(self):
+		"""Runs only see the seeded rows, whatever else the site has"""
+		return patch(
+			"dermagroup_lab.purchasing.reorder.get_reorder_rows",
+			wraps=partial(get_reorder_rows, pairs=SEEDED_PAIRS),
+		)
+
+
+class TestShardedReorder(ReorderRowsTestCase):
+	def test_shards_partition_reorder_rows(self):
+		all_rows = {(row.item_code, row.warehouse) for row in get_reorder_rows()}
+		sharded_rows = []
+		for shard in range(3):
+			sharded_rows.extend((row.item_code, row.warehouse) for row in get_reorder_rows(shard, 3))
+
+		assert len(sharded_rows) == len(set(sharded_rows))
+		assert set(sharded_rows) == all_rows
+		assert set(SEEDED_PAIRS) <= all_rows
+
+	def test_inline_run_releases_active_run(self):
+		with self.restrict_to_seeded_rows() as reorder_rows:
+			run_id = run_sharded_reorder(shard_count=2, executor=inline_executor)
+
+		assert run_id
+		assert reorder_rows.called
+		assert not frappe.cache().get(frappe.cache().make_key(ACTIVE_RUN_KEY))
+
+	def test_run_with_dead_shard_is_finalized(self):
+		cache, run_id = frappe.cache(), "_test_dead_shard"
+		cache.delete(cache.make_key(f"dermagroup_lab:reorder_run:{run_id}:finalized"))
+		cache.set(cache.make_key(ACTIVE_RUN_KEY), run_id)
+		cache.set(cache.make_key(f"dermagroup_lab:reorder_run:{run_id}:shard_count"), 2)
+		cache.hset(f"dermagroup_lab:reorder_run:{run_id}", "0", {"created": [], "notify": [], "error": None})
+		cache.hset(f"dermagroup_lab:reorder_run:{run_id}:attempts", "1", MAX_SHARD_ATTEMPTS - 1)
+
+		# Shard 1 never reported, used up its attempts and has no queued or running job left
+		summary = finalize_stale_reorder_run()
+		assert summary["failed_shards"] == [1]
+		assert not cache.get(cache.make_key(ACTIVE_RUN_KEY))
+		assert finalize_stale_reorder_run() is None
+
+	def run_interrupted_shard(self, interruption):
+		"""
+		Run a single shard in chunks of 2 that is interrupted while loading its second chunk
+		Returns: the run id and the position of the chunk committed before the interruption
+		"""
+		first_chunk = get_reorder_rows(shard=0, shard_count=1, pairs=SEEDED_PAIRS, limit=2)
+		try:
+			with (
+				patch("dermagroup_lab.purchasing.reorder.DEFAULT_CHUNK_SIZE", 2),
+				patch(
+					"dermagroup_lab.purchasing.reorder.get_reorder_rows",
+					side_effect=[first_chunk, interruption],
+				),
+			):
+				run_sharded_reorder(shard_count=1, executor=inline_executor)
+		except ShardKilled:
+			pass
+
+		cache = frappe.cache()
+		run_id = frappe.safe_decode(cache.get(cache.make_key(ACTIVE_RUN_KEY)))
+		return run_id, (first_chunk[-1].item_code, first_chunk[-1].warehouse)
+
+	def test_killed_shard_resumes_from_its_checkpoint(self):
+		run_id, after = self.run_interrupted_shard(ShardKilled)
+		assert run_id
+		assert get_checkpoint(get_checkpoint_key(0, 1), run_id)["after"] == after
+
+		# The shard left no job behind, so the watchdog retries it under the same run
+		with (
+			patch("dermagroup_lab.purchasing.reorder.DEFAULT_CHUNK_SIZE", 2),
+			self.restrict_to_seeded_rows() as reorder_rows,
+		):
+			assert finalize_stale_reorder_run(executor=inline_executor) is None
+
+		assert reorder_rows.call_args_list[0].kwargs["after"] == after
+		assert get_checkpoint(get_checkpoint_key(0, 1), run_id) == {"after": None, "pending": []}
+		assert not frappe.cache().get(frappe.cache().make_key(ACTIVE_RUN_KEY))
+
+	def test_failed_shard_is_retried(self):
+		with patch("frappe.enqueue") as enqueue:
+			run_id, after = self.run_interrupted_shard(frappe.ValidationError)
+
+		retry = enqueue.call_args.kwargs
+		assert retry["job_id"] == get_shard_job_id(run_id, 0, attempt=1)
+		assert (retry["run_id"], retry["shard"], retry["shard_count"], retry["attempt"]) == (run_id, 0, 1, 1)
+		assert get_checkpoint(get_checkpoint_key(0, 1), run_id)["after"] == after
+
+		# The run waits for the retry instead of being finalized
+		with patch("dermagroup_lab.purchasing.reorder_shards.is_job_enqueued", return_value=True):
+			assert finalize_stale_reorder_run() is None
+		assert frappe.cache().get(frappe.cache().make_key(ACTIVE_RUN_KEY))
+
+		frappe.cache().delete(frappe.cache().make_key(ACTIVE_RUN_KEY))
+
+
+class TestChunkedReorder(ReorderRowsTestCase):
+	def test_keyset_chunks_cover_all_rows_in_order(self):
+		chunked_rows, after = [], None
+		while True:
+			chunk = get_reorder_rows(pairs=SEEDED_PAIRS, after=after, limit=2)
+			if not chunk:
+				break
+			chunked_rows.extend((row.item_code, row.warehouse) for row in chunk)
+			after = chunked_rows[-1]
+
+		assert chunked_rows == sorted(SEEDED_PAIRS)
+
+	def test_reorder_rows_filtered_by_pairs(self):
+		assert get_reorder_rows(pairs=[]) == []
+		pair = SEEDED_PAIRS[0]
+		assert [(row.item_code, row.warehouse) for row in get_reorder_rows(pairs=[pair])] == [pair]
+
+	def get_resume_position(self, checkpoint):
+		"""The position the first chunk of a run is loaded after, given a stored checkpoint"""
+		frappe.db.set_global(get_checkpoint_key(), frappe.as_json(checkpoint))
+		with self.restrict_to_seeded_rows() as reorder_rows:
+			run_reorder(chunk_size=2)
+		return reorder_rows.call_args_list[0].kwargs["after"]
+
+	def test_completed_run_clears_checkpoint(self):
+		with self.restrict_to_seeded_rows() as reorder_rows:
+			run_reorder(chunk_size=2)
+
+		# 5 rows in chunks of 2
+		assert reorder_rows.call_count == 3
+		assert get_checkpoint(get_checkpoint_key()) == {"after": None, "pending": []}
+
+	def test_resumes_after_todays_checkpoint(self):
+		after = (SEEDED_ITEMS[2], SEEDED_WAREHOUSE)
+		assert self.get_resume_position({"run_date": nowdate(), "after": after}) == after
+
+	def test_ignores_stale_checkpoint(self):
+		after = (SEEDED_ITEMS[2], SEEDED_WAREHOUSE)
+		assert self.get_resume_position({"run_date": add_days(nowdate(), -1), "after": after}) is None
+
+
+class TestIncrementalReorder(FrappeTestCase):
+	def tearDown(self):
+		cache = frappe.cache()
+		for key in (DIRTY_PAIRS_KEY, PROCESSING_PAIRS_KEY, ACTIVE_RUN_KEY):
+			cache.delete(cache.make_key(key))
+
+	def test_incremental_run_backs_off_during_daily_run(self):
+		cache = frappe.cache()
+		cache.set(cache.make_key(ACTIVE_RUN_KEY), "_test_daily_run")
+		mark_pairs_dirty([("_Test Item", "_Test Warehouse - _TC")])
+
+		assert process_dirty_reorder_pairs() == []
+		# The pairs stay queued and the daily lock is left to its run
+		assert cache.smembers(DIRTY_PAIRS_KEY)
+		assert cache.get(cache.make_key(ACTIVE_RUN_KEY))
+
+	def test_dirty_pairs_are_deduplicated_and_taken_once(self):
+		mark_pairs_dirty([("_Test Item", "_Test Warehouse - _TC")] * 3 + [("_Test Item", None)])
+		assert take_dirty_pairs() == [("_Test Item", "_Test Warehouse - _TC")]
+
+		mark_pairs_dirty([("_Test Item 2", "_Test Warehouse - _TC")])
+		# Pairs left by an unfinished run are merged with the newly marked ones
+		assert set(take_dirty_pairs()) == {
+			("_Test Item", "_Test Warehouse - _TC"),
+			("_Test Item 2", "_Test Warehouse - _TC"),
+		}
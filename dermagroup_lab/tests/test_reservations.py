@@ -0,0 +1,137 @@
+import threading
+import time
+from unittest.mock import patch
+
+import frappe
+from erpnext.stock.doctype.item.test_item import make_item
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, nowdate
+
+from dermagroup_lab.purchasing.consolidation import create_consolidated_material_requests
+from dermagroup_lab.purchasing.reservations import claim_reservations
+
+PAIR = ("_Test Reservation Item", "_Test Warehouse - _TC")
+COMPANY = "_Test Company"
+WORKERS = 8
+
+
+class TestMaterialRequestReservations(FrappeTestCase):
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		make_item(PAIR[0], {"is_stock_item": 1})
+		frappe.db.commit()
+
+	def tearDown(self):
+		frappe.db.delete("Material Request Reservation", {"item_code": PAIR[0]})
+		for name in frappe.get_all(
+			"Material Request Item", filters={"item_code": PAIR[0]}, pluck="parent", distinct=True
+		):
+			frappe.db.delete("Material Request Item", {"parent": name})
+			frappe.db.delete("Material Request", {"name": name})
+		frappe.db.commit()
+
+	def run_workers(self, worker, count=WORKERS):
+		"""Run worker in parallel threads, each with its own site connection"""
+		return self.run_in_parallel([worker] * count)
+
+	def run_in_parallel(self, workers):
+		"""Run every worker in its own thread and site connection, all starting together"""
+		site, results, barrier = frappe.local.site, [], threading.Barrier(len(workers))
+
+		def run(worker):
+			frappe.init(site=site)
+			frappe.connect()
+			frappe.set_user("Administrator")
+			try:
+				barrier.wait()
+				results.append(worker())
+			finally:
+				frappe.destroy()
+
+		threads = [threading.Thread(target=run, args=(worker,)) for worker in workers]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		return results
+
+	def test_parallel_claims_reserve_once(self):
+		def worker():
+			claimed = claim_reservations([PAIR])
+			# Hold the uncommitted claim so the other workers block on it
+			time.sleep(0.2)
+			frappe.db.commit()
+			return claimed
+
+		results = self.run_workers(worker)
+		assert len(results) == WORKERS
+		assert sum(len(claimed) for claimed in results) == 1
+
+	def test_rolled_back_claim_is_released(self):
+		def worker():
+			claimed = claim_reservations([PAIR])
+			frappe.db.rollback()
+			return claimed
+
+		results = self.run_workers(worker, count=2)
+		assert all(claimed == {PAIR} for claimed in results)
+		assert not frappe.db.exists("Material Request Reservation", {"item_code": PAIR[0]})
+
+	def test_claims_are_scoped_by_supplier(self):
+		assert claim_reservations([PAIR], supplier="_Test Supplier") == {PAIR}
+		assert claim_reservations([PAIR], supplier="_Test Supplier 1") == {PAIR}
+		assert claim_reservations([PAIR]) == {PAIR}
+		assert claim_reservations([PAIR], supplier="_Test Supplier") == set()
+
+	def test_manual_and_consolidated_requests_create_one_line(self):
+		def insert_manually():
+			mr = frappe.get_doc(
+				{
+					"doctype": "Material Request",
+					"material_request_type": "Purchase",
+					"company": COMPANY,
+					"transaction_date": nowdate(),
+					"schedule_date": add_days(nowdate(), 7),
+					"items": [
+						{
+							"item_code": PAIR[0],
+							"warehouse": PAIR[1],
+							"qty": 5,
+							"schedule_date": add_days(nowdate(), 7),
+						}
+					],
+				}
+			)
+			try:
+				mr.insert()
+			except frappe.ValidationError:
+				frappe.db.rollback()
+				return []
+			frappe.db.commit()
+			return [mr.name]
+
+		def create_consolidated():
+			created = create_consolidated_material_requests(
+				[
+					{
+						"company": COMPANY,
+						"supplier": None,
+						"items": [{"item_code": PAIR[0], "warehouse": PAIR[1], "qty": 5}],
+					}
+				]
+			)
+			frappe.db.commit()
+			return [mr_name for mr_name, _group in created]
+
+		# Submitting needs an approval, the race is decided when the request is inserted
+		with (
+			patch("frappe.model.document.Document.submit"),
+			patch("dermagroup_lab.purchasing.consolidation.notify_purchasing_of_material_request"),
+		):
+			results = self.run_in_parallel([insert_manually, create_consolidated] * (WORKERS // 2))
+
+		assert sum(len(created) for created in results) == 1
+		# New snapshot, so the commits of the workers are visible
+		frappe.db.rollback()
+		assert frappe.db.count("Material Request Item", {"item_code": PAIR[0], "warehouse": PAIR[1]}) == 1
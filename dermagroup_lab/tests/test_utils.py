@@ -1,5 +1,18 @@
-from dermagroup_lab.purchasing.validations import check_duplicate_requests
+from unittest.mock import patch
+
+import frappe
+
+from dermagroup_lab.purchasing.utils import (
+	DUPLICATE_REQUEST_DAYS,
+	create_auto_material_requests,
+	create_shortage_material_requests,
+	get_shortage_job_id,
+)
+from dermagroup_lab.purchasing.validations import check_duplicate_requests, check_duplicate_requests_bulk
 from dermagroup_lab.tests.test_base import TestBase
+from dermagroup_lab.tests.test_demand import RAW_ITEM, WAREHOUSE, WorkOrderTestCase
+
+SHORTAGE_ITEMS = [{"item_code": RAW_ITEM, "warehouse": WAREHOUSE, "shortage": 2}]
 
 
 class TestUtilsCheckDuplicateRequests(TestBase):
@@ -14,3 +27,88 @@ class TestUtilsCheckDuplicateRequests(TestBase):
 		)
 		duplicates = check_duplicate_requests(item_code=self.test_item)
 		assert not duplicates
+
+
+class TestUtilsCheckDuplicateRequestsBulk(TestBase):
+	def test_duplicates_grouped_by_item(self):
+		mr_name = self.create_material_request(item_code=self.test_item, warehouse=self.test_warehouse)
+		duplicates = check_duplicate_requests_bulk([self.test_item, "_Test Item Without Requests"])
+		assert mr_name in [row.name for row in duplicates[self.test_item]]
+		assert "_Test Item Without Requests" not in duplicates
+
+	def test_empty_item_list(self):
+		assert check_duplicate_requests_bulk([]) == {}
+
+
+class TestUtilsCreateAutoMaterialRequests(TestBase):
+	def test_one_request_per_item(self):
+		items = [
+			{"item_code": self.test_item, "warehouse": self.test_warehouse, "shortage": 4},
+			{"item_code": self.test_item, "warehouse": "_Test Warehouse - _TC", "shortage": 6},
+		]
+		with patch(
+			"dermagroup_lab.purchasing.utils.create_consolidated_material_requests", return_value=[]
+		) as create:
+			_created, skipped = create_auto_material_requests(items, self.company)
+
+		(groups,) = create.call_args.args
+		assert [
+			(row["item_code"], row["warehouse"], row["qty"]) for group in groups for row in group["items"]
+		] == [(self.test_item, self.test_warehouse, 4)]
+		assert skipped == [self.test_item]
+
+
+class TestUtilsShortageMaterialRequests(WorkOrderTestCase):
+	def test_shortage_is_queued_after_commit(self):
+		with (
+			patch("frappe.enqueue", wraps=frappe.enqueue) as enqueue,
+			patch("dermagroup_lab.purchasing.utils.create_auto_material_requests") as create,
+		):
+			work_order = self.make_work_order(qty=12)
+
+		(kwargs,) = [
+			call.kwargs
+			for call in enqueue.call_args_list
+			if call.args == ("dermagroup_lab.purchasing.utils.create_shortage_material_requests",)
+		]
+		assert kwargs["enqueue_after_commit"]
+		assert kwargs["job_id"] == get_shortage_job_id(work_order.name)
+		assert [(row["item_code"], row["shortage"]) for row in kwargs["items"]] == [(RAW_ITEM, 2)]
+		create.assert_not_called()
+		assert not frappe.db.exists("Material Request Item", {"item_code": RAW_ITEM})
+
+
+class TestUtilsCreateShortageMaterialRequests(TestBase):
+	def run_job(self, **create_kwargs):
+		with (
+			patch("dermagroup_lab.purchasing.utils.create_auto_material_requests", **create_kwargs),
+			patch("frappe.db.commit"),
+			patch("frappe.db.rollback") as rollback,
+			patch("frappe.publish_realtime") as publish,
+		):
+			create_shortage_material_requests("WO-TEST", self.company, SHORTAGE_ITEMS, "Administrator")
+
+		event, payload = publish.call_args.args
+		assert event == "shortage_material_requests"
+		assert publish.call_args.kwargs["user"] == "Administrator"
+		assert payload["work_order"] == "WO-TEST"
+		assert payload["job_id"] == get_shortage_job_id("WO-TEST")
+		assert payload["duplicate_days"] == DUPLICATE_REQUEST_DAYS
+		return payload, rollback
+
+	def test_created_requests_are_published(self):
+		created = [("MAT-MR-TEST", {"items": [{"item_code": RAW_ITEM}]})]
+		payload, rollback = self.run_job(return_value=(created, ["_Test Skipped Item"]))
+
+		assert payload["error"] is None
+		assert payload["material_requests"] == [{"name": "MAT-MR-TEST", "items": [RAW_ITEM]}]
+		assert payload["skipped"] == ["_Test Skipped Item"]
+		rollback.assert_not_called()
+
+	def test_failure_is_rolled_back_and_published(self):
+		payload, rollback = self.run_job(side_effect=frappe.ValidationError)
+
+		rollback.assert_called_once()
+		assert payload["error"]
+		assert "material_requests" not in payload
+		assert "skipped" not in payload